@@ -1,36 +1,187 @@
-from flask import Flask, request, jsonify, render_template_string, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
+from markupsafe import Markup
 import requests
-from bs4 import BeautifulSoup
 import os
+import json
+import logging
+import mimetypes
+import random
 from datetime import datetime, timedelta
-from models import db, Event, User
-from notion_utils import NotionManager
+from models import db, Event, EventResult, EventSnapshot, TrackedEvent, User
+import history
+from notion_utils import NotionManager, build_result_blocks
+from notion_sync import Checkpoint, publish_pages, verify_pages
+from preview_store import create_preview_store
+from jobs import JobManager, JobQueueFull, PrefixedReporter, create_job_store
+from result_cache import ResultCache, create_cache_backend
+from fragment_cache import create_fragment_cache, fragment_key, template_version
+from thumbnails import create_thumbnail_cache, is_key as is_thumbnail_key
+from daily_image import VARIANTS as DAILY_IMAGE_VARIANTS, create_daily_image
+from page_storage import create_page_storage
+from refresh import RefreshScheduler, results_hash
+from results import ENGINES, ResultSet, SearchResult
+from result_parser import EngineSpec, Field, iter_results, iter_text, parse_html
+from profiling import create_profiler
+import metrics
+import log_utils
+import lang_filter
+import ranking
+import click
+import contextvars
 from dotenv import load_dotenv
 import re
 import signal
 import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
 load_dotenv()
+log_utils.setup_logging()
+log = logging.getLogger(__name__)
+# 每条搜索结果一条的日志，按 LOG_SAMPLE_RATE 采样
+item_log = log_utils.item_logger(__name__)
 
 app = Flask(__name__, static_folder='static')
 
 # 数据库配置
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///trending.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///trending.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
-# 确保events目录存在
-EVENTS_DIR = 'static/events'
-os.makedirs(EVENTS_DIR, exist_ok=True)
+@lru_cache(maxsize=None)
+def compile_template(source):
+    """模板按源码缓存编译结果，避免每次渲染都重新编译"""
+    return app.jinja_env.from_string(source)
+
+def render_template_cached(source, **context):
+    return compile_template(source).render(**context)
+
+# 结果缩略图通过 /thumbs/<key> 代理；THUMBNAIL_PROXY=0 时页面直接引用原图地址。发布到 docs 的页面总是引用原图
+THUMBNAIL_PROXY = os.getenv('THUMBNAIL_PROXY', '1') != '0'
+thumbnail_cache = create_thumbnail_cache(os.path.join(app.instance_path, 'thumbnails'))
+
+@app.template_filter('thumbnail')
+def thumbnail_filter(url):
+    if not THUMBNAIL_PROXY:
+        return url
+    try:
+        return thumbnail_cache.proxy_url(url)
+    except Exception as e:
+        log.warning("Error registering thumbnail %s: %s", url[:100], e)
+        return url
 
-# 添加新的配置
+def static_page_html(html_content):
+    """GitHub Pages 是静态托管，没有 /thumbs 路由，发布到 docs 的页面改回引用原图"""
+    return thumbnail_cache.unproxy_html(html_content)
+
+# 登录页背景图，每天从 Bing 获取一次并缓存在本地
+daily_image = create_daily_image(os.path.join(app.instance_path, 'daily_image'))
+
+# 事件页面和 GitHub Pages 页面默认保存在本地目录，PAGE_STORAGE_URL=s3://... 时保存在对象存储中，多个节点共用
+EVENTS_DIR = 'static/events'
 GITHUB_PAGES_DIR = 'docs'  # GitHub Pages 默认使用 /docs 目录
-os.makedirs(GITHUB_PAGES_DIR, exist_ok=True)
+event_pages = create_page_storage('events', EVENTS_DIR)
+docs_pages = create_page_storage('docs', GITHUB_PAGES_DIR)
 
 # 配置 Notion
 NOTION_TOKEN = os.getenv('NOTION_TOKEN')
 NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
-notion_manager = NotionManager(NOTION_TOKEN, NOTION_DATABASE_ID)
+_notion_manager = None
+_notion_lock = threading.Lock()
+
+def get_notion_manager():
+    """首次使用时才创建 NotionManager，启动和导入都不需要访问网络"""
+    global _notion_manager
+    if _notion_manager is None:
+        with _notion_lock:
+            if _notion_manager is None:
+                _notion_manager = NotionManager(NOTION_TOKEN, NOTION_DATABASE_ID)
+    return _notion_manager
+
+# 预览页面只保存在内存（或可选的共享存储）中，不再写 preview_ 文件
+preview_store = create_preview_store()
+
+# 发布任务在有界线程池中执行，Web worker 立即返回；JOB_STORE=sqlite:///... 时任一 worker 都能查询任务进度
+job_manager = JobManager(
+    max_workers=int(os.getenv('PUBLISH_WORKERS', '4')),
+    max_pending=int(os.getenv('PUBLISH_MAX_PENDING', '100')),
+    store=create_job_store()
+)
+
+# 搜索引擎地址，压测时可以指向本地的模拟服务（benchmarks/loadtest.py）
+BING_BASE_URL = os.getenv('BING_BASE_URL', 'https://cn.bing.com').rstrip('/')
+MSN_BASE_URL = os.getenv('MSN_BASE_URL', 'https://www.msn.cn').rstrip('/')
+BAIDU_BASE_URL = os.getenv('BAIDU_BASE_URL', 'https://www.baidu.com').rstrip('/')
+
+# 所有搜索引擎请求共用连接池
+http_session = requests.Session()
+_engine_adapter = requests.adapters.HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=int(os.getenv('ENGINE_WORKERS', '8')) * 2
+)
+http_session.mount('https://', _engine_adapter)
+http_session.mount('http://', _engine_adapter)
+
+# 结果页边下载边解析：拿够条数就停止读取，响应体超过字节上限或读取超时都只解析已收到的部分
+ENGINE_MAX_RESULTS = 10
+ENGINE_MAX_BYTES = int(os.getenv('ENGINE_MAX_BYTES', str(2 * 1024 * 1024)))
+ENGINE_READ_TIMEOUT = float(os.getenv('ENGINE_READ_TIMEOUT', '15'))
+
+# 短时间内同一关键词的抓取结果共享（预览后发布、批量发布中的重复关键词）；
+# FETCH_CACHE_URL 设置为 sqlite:///... 或 redis://... 时各 worker 进程共享
+def _dump_results(results):
+    return json.dumps([result.to_dict() for result in results], ensure_ascii=False)
+
+def _load_results(data):
+    return [SearchResult.from_dict(item) for item in json.loads(data)]
+
+fetch_cache = ResultCache(
+    ttl=float(os.getenv('FETCH_CACHE_TTL', '300')),
+    backend=create_cache_backend(),
+    dumps=_dump_results,
+    loads=_load_results,
+    lock_timeout=float(os.getenv('FETCH_CACHE_LOCK_TIMEOUT', '30')),
+)
+
+# 按需分析单个请求的 CPU 和内存，默认关闭（PROFILE_TOKEN / PROFILE_SAMPLE_RATE）
+profiler = create_profiler()
+
+# 流式预览并发抓取各搜索引擎
+engine_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ENGINE_WORKERS', '8')),
+    thread_name_prefix='engine'
+)
+
+_db_ready = False
+_db_lock = threading.Lock()
+
+def ensure_db():
+    """首次请求时才建表和创建管理员账户"""
+    global _db_ready
+    if not _db_ready:
+        with _db_lock:
+            if not _db_ready:
+                _db_ready = init_db()
+
+@app.before_request
+def _assign_request_id():
+    log_utils.request_id.set(request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16])
+
+@app.after_request
+def _echo_request_id(response):
+    response.headers['X-Request-ID'] = log_utils.request_id.get()
+    return response
+
+@app.teardown_request
+def _clear_request_id(exc):
+    # 线程会被下一个请求复用，避免后续的非请求日志沿用这个 id
+    log_utils.request_id.set('-')
+
+@app.before_request
+def _bootstrap_db():
+    ensure_db()
 
 # 创建所有数据库表
 def init_db():
@@ -42,19 +193,36 @@ def init_db():
                 admin = User(username='admin', password='password')
                 db.session.add(admin)
                 db.session.commit()
-            print("数据库初始化成功")  # 添加成功日志
+            log.info("数据库初始化成功")
+        return True
     except Exception as e:
-        print(f"数据库初始化错误: {str(e)}")  # 添加错误日志
+        log.exception("数据库初始化错误: %s", e)
+        return False
+
+def drain(timeout=30):
+    """停止接收新的发布任务，等待进行中的任务在 timeout 秒内完成"""
+    log.info('等待进行中的发布任务完成...')
+    finished = job_manager.shutdown(timeout)
+    if not finished:
+        log.warning('仍有 %d 个任务未完成，强制退出', job_manager.pending())
+    return finished
+
+def warm_up():
+    """在 fork worker 之前完成的准备工作：建表、编译模板"""
+    ensure_db()
+    with app.app_context():
+        # 不把 SQLite 连接带进子进程
+        db.engine.dispose()
+    for template in (TEMPLATE, NEWS_ITEM_TEMPLATE, PREVIEW_SHELL_TEMPLATE, PREVIEW_BLOCK_TEMPLATE,
+                     PREVIEW_TIMELINE_TEMPLATE, PREVIEW_UPDATE_TEMPLATE):
+        compile_template(template)
 
 def signal_handler(sig, frame):
-    """处理退出信号"""
-    print('正在关闭应用...')
+    """处理退出信号（仅开发服务器使用）"""
+    log.info('正在关闭应用...')
+    drain(float(os.getenv('WEB_GRACEFUL_TIMEOUT', '30')))
     sys.exit(0)
 
-# 注册信号处理器
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
-
 @app.route('/')
 def index():
     return send_from_directory('static', 'login.html')
@@ -63,6 +231,45 @@ def index():
 def dashboard():
     return send_from_directory('static', 'dashboard.html')
 
+@app.route('/api/daily-image')
+def daily_image_info():
+    """当天背景图的标题、版权信息和各尺寸地址"""
+    meta = daily_image.current()
+    if meta is None:
+        return jsonify({'error': 'Daily image unavailable'}), 503
+    response = jsonify({
+        'title': meta['title'],
+        'copyright': meta['copyright'],
+        'date': meta['date'],
+        'variants': {name: f'/daily-image/{name}.jpg' for name in meta['variants']},
+    })
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+@app.route('/daily-image/<variant>.jpg')
+def daily_image_file(variant):
+    path = daily_image.image_path(variant) if variant in DAILY_IMAGE_VARIANTS else None
+    if path is None:
+        return jsonify({'error': 'Not found'}), 404
+    # 地址不随日期变化，缓存一小时，之后用 ETag 验证
+    return send_from_directory(os.path.abspath(os.path.dirname(path)), os.path.basename(path),
+                               mimetype='image/jpeg', max_age=3600)
+
+@app.route('/static/events/<path:filename>')
+def event_page(filename):
+    """事件页面从页面存储读取，任一节点都可以返回其它节点发布的页面"""
+    try:
+        found = event_pages.fetch(filename)
+    except ValueError:
+        found = None
+    if found is None:
+        return jsonify({'error': 'Not found'}), 404
+    content, etag = found
+    response = Response(content, mimetype=mimetypes.guess_type(filename)[0] or 'text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -84,53 +291,261 @@ def login():
 
 @app.route('/api/search')
 def search():
+    """发布事件：立即返回任务 id，抓取和生成页面在后台线程池中完成"""
     keyword = request.args.get('keyword')
+    if not keyword:
+        return jsonify({'error': 'Keyword is required'}), 400
     
-    # 搜索Bing、MSN和百度
-    bing_results = search_bing(keyword)
-    msn_results = search_msn(keyword)
-    baidu_results = search_baidu(keyword)
+    # 分析在后台任务中进行，覆盖整个发布流水线
+    profile_id = profiler.trigger('search', request.headers)
+    try:
+        job = job_manager.submit(
+            'publish', run_publish, keyword, request.host_url, request.args.get('preview_id'),
+            description=keyword, profile_id=profile_id
+        )
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
     
-    # 生成结果页面
-    page_url = generate_results_page(keyword, bing_results, msn_results, baidu_results)
+    response = {
+        'job_id': job.id,
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events'
+    }
+    if profile_id and profiler.authorized(request.headers):
+        response['profile_id'] = profile_id
+    return jsonify(response), 202
+
+def fetch_results(engine, keyword, limits=None, use_cache=True):
+    """抓取单个搜索引擎的结果
+
+    limits 为 {engine: Semaphore}，用来限制每个搜索引擎的并发请求数；
+    use_cache 为 True 时复用 fetch_cache 中未过期的结果。
+    """
+    search = {'bing': search_bing, 'msn': search_msn, 'baidu': search_baidu}[engine]
     
-    # 创建 Notion 页面
-    content = format_content_for_notion(keyword, bing_results, msn_results, baidu_results)
-    notion_page_id = notion_manager.create_page(
-        title=keyword,
-        content=content,
-        url=request.host_url + page_url.lstrip('/')
-    )
+    def fetch():
+        limit = (limits or {}).get(engine)
+        with metrics.timer('engine', engine=engine):
+            if limit is None:
+                results = search(keyword)
+            else:
+                with limit:
+                    results = search(keyword)
+        metrics.record_results(engine, len(results))
+        return results
     
-    # 保存到数据库
-    event = Event(
-        keyword=keyword,
-        url=page_url,
-        notion_page_id=notion_page_id
-    )
-    db.session.add(event)
-    db.session.commit()
+    if not use_cache:
+        return fetch()
+    return fetch_cache.get_or_compute((engine, keyword), fetch)
+
+def run_publish(job, keyword, host_url, preview_id=None, rebuild_index=True, limits=None, profile_id=None):
+    """发布流水线：抓取 → 渲染 → 写文件 → Notion → 数据库 → 索引，每完成一步汇报一次"""
+    with app.app_context(), metrics.route('search'), metrics.timer('total'), \
+            profiler.session(profile_id, route='search', keyword=keyword, request_id=log_utils.request_id.get()):
+        # 搜索Bing、MSN和百度
+        results = ResultSet()
+        for engine in ENGINES:
+            setattr(results, engine, fetch_results(engine, keyword, limits))
+            job.report(engine, f'{engine} done ({len(getattr(results, engine))} results)')
+        
+        # 生成结果页面
+        html_content = render_results_page(keyword, results)
+        job.report('rendered', 'rendered')
+        page_url = save_results_page(keyword, html_content)
+        job.report('saved', f'saved {page_url}')
+        
+        # 创建 Notion 页面
+        content = format_content_for_notion(keyword, results)
+        with metrics.timer('notion'):
+            notion_page_id = get_notion_manager().create_page(
+                title=keyword,
+                content=content,
+                url=host_url + page_url.lstrip('/')
+            )
+        if not notion_page_id:
+            metrics.record_error('notion')
+        job.report('notion', 'notion page created' if notion_page_id else 'notion failed, use backfill later')
+        
+        # 保存到数据库
+        event = Event(
+            keyword=keyword,
+            url=page_url,
+            notion_page_id=notion_page_id
+        )
+        with metrics.timer('db'):
+            db.session.add(event)
+            db.session.commit()
+            
+            # 保存搜索结果，之后补发 Notion 时无需重新抓取；同时作为历史版本 1
+            db.session.add(EventResult.from_results(event.id, results))
+            history.record_snapshot(event.id, results)
+            db.session.commit()
+        job.report('db', f'event {event.id} saved')
+        
+        # 更新索引页面（此时新事件已经入库），批量发布时只在最后更新一次
+        if rebuild_index:
+            with metrics.timer('index'):
+                generate_index_page()
+            job.report('indexed', 'index rebuilt')
+        
+        # 删除对应的预览
+        if preview_id:
+            preview_store.delete(preview_id)
+        
+        return {
+            'url': page_url,
+            'event_id': event.id,
+            'notion_page_id': notion_page_id,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+# 批量发布的并发上限：同时发布的关键词数不超过发布线程数的 4 倍，每个搜索引擎的并发不超过抓取线程数
+MAX_BATCH_CONCURRENCY = int(os.getenv('PUBLISH_WORKERS', '4')) * 4
+MAX_ENGINE_CONCURRENCY = int(os.getenv('ENGINE_WORKERS', '8'))
+
+def batch_limits(concurrency, engine_concurrency):
+    """转换批量发布的并发参数并限制在上限以内，不是正整数时抛出 ValueError"""
+    limits = []
+    for name, value, upper in (('concurrency', concurrency, MAX_BATCH_CONCURRENCY),
+                               ('engine_concurrency', engine_concurrency, MAX_ENGINE_CONCURRENCY)):
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be an integer') from None
+        if isinstance(value, bool) or number < 1:
+            raise ValueError(f'{name} must be a positive integer')
+        limits.append(min(number, upper))
+    return tuple(limits)
+
+def run_batch(job, keywords, host_url, concurrency=4, engine_concurrency=2):
+    """批量发布：多个关键词并发执行发布流水线，最后统一重建一次索引"""
+    concurrency, engine_concurrency = batch_limits(concurrency, engine_concurrency)
+    limits = {engine: threading.BoundedSemaphore(engine_concurrency) for engine in ENGINES}
+    
+    def publish_one(keyword):
+        started = datetime.now()
+        try:
+            result = run_publish(PrefixedReporter(job, keyword), keyword, host_url,
+                                 rebuild_index=False, limits=limits)
+            result.update({'keyword': keyword, 'status': 'done'})
+        except Exception as e:
+            log.warning("Batch publish failed for %s: %s", keyword, e)
+            result = {'keyword': keyword, 'status': 'failed', 'error': str(e)}
+        result['seconds'] = round((datetime.now() - started).total_seconds(), 3)
+        job.report('keyword', f"{keyword}: {result['status']}", result)
+        return result
     
-    # 删除对应的预览文件
-    delete_preview_file(keyword)
+    # 各关键词的日志沿用批量任务的请求 id
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as executor:
+        report = list(executor.map(lambda keyword: context.copy().run(publish_one, keyword), keywords))
     
-    return jsonify({
-        'url': page_url,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
+    with app.app_context():
+        generate_index_page()
+    job.report('indexed', 'index rebuilt')
+    
+    return {
+        'total': len(report),
+        'succeeded': sum(1 for item in report if item['status'] == 'done'),
+        'failed': sum(1 for item in report if item['status'] == 'failed'),
+        'results': report
+    }
 
-def format_content_for_notion(keyword, bing_results, msn_results, baidu_results):
-    content = ""
+def parse_keywords(keywords):
+    """去掉空白和重复的关键词，保持原有顺序"""
+    return list(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))
+
+@app.route('/api/batch', methods=['POST'])
+def batch_publish():
+    """批量发布关键词列表，返回任务 id，进度和每个关键词的结果通过任务接口获取"""
+    data = request.get_json(silent=True) or {}
+    keywords = parse_keywords(data.get('keywords') or [])
+    if not keywords:
+        return jsonify({'error': 'Keywords are required'}), 400
+    
+    try:
+        concurrency, engine_concurrency = batch_limits(
+            data.get('concurrency', os.getenv('BATCH_CONCURRENCY', '4')),
+            data.get('engine_concurrency', os.getenv('BATCH_ENGINE_CONCURRENCY', '2'))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        job = job_manager.submit(
+            'batch', run_batch, keywords, request.host_url, concurrency, engine_concurrency,
+            description=f'{len(keywords)} keywords'
+        )
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
     
-    if bing_results:
-        for result in bing_results:
-            content += f"• {result.get('title', '')}\n{result.get('snippet', '')}\n{result.get('link', '')}\n\n"
+    return jsonify({
+        'job_id': job.id,
+        'keywords': len(keywords),
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events'
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """以 Server-Sent Events 推送任务的每个阶段"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
     
-    if msn_results:
-        for result in msn_results:
-            content += f"• {result.get('title', '')}\n{result.get('snippet', '')}\n{result.get('link', '')}\n\n"
+    def stream():
+        index = 0
+        while True:
+            events, finished = job.wait_events(index)
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            index += len(events)
+            if finished and not events:
+                break
+            if not events:
+                # 保持连接，避免代理超时断开
+                yield ': keep-alive\n\n'
     
-    return content.strip()
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# 结果合并排序：RANK_WEIGHTS 调整相关度、新近程度和多引擎一致性的权重，RANK_TOP_N 为保留的条数（0 表示全部）
+RANK_WEIGHTS = ranking.parse_weights(os.getenv('RANK_WEIGHTS'))
+RANK_TOP_N = int(os.getenv('RANK_TOP_N', '30'))
+RANK_HALF_LIFE_DAYS = float(os.getenv('RANK_HALF_LIFE_DAYS', '3'))
+
+_FULL_DATE = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')
+
+def result_date(result):
+    """结果对应的日期（来自时间线提取），没有完整日期时返回 None"""
+    event = extract_timeline_event(result)
+    match = _FULL_DATE.search(event['time']) if event else None
+    if not match:
+        return None
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+def rank_results(keyword, results):
+    """合并各搜索引擎的结果并按得分排序，返回前 RANK_TOP_N 条 RankedResult"""
+    with metrics.timer('rank'):
+        return ranking.rank(keyword, results.groups(), result_date, datetime.now(), top_n=RANK_TOP_N,
+                            weights=RANK_WEIGHTS, half_life_days=RANK_HALF_LIFE_DAYS)
+
+def format_content_for_notion(keyword, results):
+    """把搜索结果（ResultSet）按合并排序转换成 Notion 块列表"""
+    ranked = rank_results(keyword, results)
+    return list(build_result_blocks([('综合排序', [item.result for item in ranked])]))
 
 @app.route('/api/events')
 def get_events():
@@ -138,7 +553,7 @@ def get_events():
         events = Event.query.order_by(Event.timestamp.desc()).all()
         return jsonify([event.to_dict() for event in events])
     except Exception as e:
-        print(f"获取事件列表错误: {str(e)}")  # 添加错误日志
+        log.exception("获取事件列表错误: %s", e)
         return jsonify([])
 
 @app.route('/api/events/<int:event_id>', methods=['DELETE'])
@@ -147,184 +562,134 @@ def delete_event(event_id):
     
     # 删除关联的HTML文件
     if event.url.startswith('/static/events/'):
-        file_path = os.path.join(app.static_folder, 'events', os.path.basename(event.url))
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        event_pages.delete(os.path.basename(event.url))
     
     # 从数据库中删除记录
+    EventResult.query.filter_by(event_id=event.id).delete()
+    TrackedEvent.query.filter_by(event_id=event.id).delete()
+    EventSnapshot.query.filter_by(event_id=event.id).delete()
     db.session.delete(event)
     db.session.commit()
     
     return jsonify({'success': True, 'message': '删除成功'})
 
 @app.route('/api/preview')
+@metrics.instrument('preview')
 def preview():
     try:
         keyword = request.args.get('keyword')
         if not keyword:
             return jsonify({'error': 'Keyword is required'}), 400
             
-        print(f"Generating preview for keyword: {keyword}")
-        
-        # 搜索Bing和MSN
-        bing_results = search_bing(keyword)
-        print(f"Got {len(bing_results)} results from Bing")
-        
-        msn_results = search_msn(keyword)
-        print(f"Got {len(msn_results)} results from MSN")
+        log.debug("Generating preview for keyword: %s", keyword)
         
-        if not bing_results and not msn_results:
-            print("Warning: No results found from either Bing or MSN")
-        
-        # 生成预览页面
-        page_url = generate_preview_page(keyword, bing_results, msn_results)
-        print(f"Generated preview page: {page_url}")
+        profile_id = profiler.trigger('preview', request.headers)
+        with profiler.session(profile_id, route='preview', keyword=keyword, request_id=log_utils.request_id.get()):
+            # 搜索Bing和MSN
+            results = ResultSet(bing=fetch_results('bing', keyword), msn=fetch_results('msn', keyword))
+            
+            if not results:
+                log.warning("No results found from either Bing or MSN for %s", keyword)
+            
+            # 生成预览页面
+            page_url = generate_preview_page(keyword, results)
+        log.info("Generated preview %s for %s (bing=%d, msn=%d)",
+                 page_url, keyword, len(results.bing), len(results.msn))
         
-        return jsonify({
+        response = jsonify({
             'url': page_url,
-            'bing_count': len(bing_results),
-            'msn_count': len(msn_results)
+            'bing_count': len(results.bing),
+            'msn_count': len(results.msn)
         })
+        if profile_id and profiler.authorized(request.headers):
+            response.headers['X-Profile-Id'] = profile_id
+        return response
     except Exception as e:
-        print(f"Error generating preview: {str(e)}")
+        log.exception("Error generating preview: %s", e)
         return jsonify({'error': str(e)}), 500
 
+def language_filter(engine):
+    """按 LANG_POLICY / LANG_POLICY_<ENGINE> 过滤一批结果（默认丢弃含假名的结果）"""
+    policy = lang_filter.policy_for(engine)
+
+    def apply(results):
+        kept, dropped = policy.apply(results)
+        if dropped:
+            metrics.record_filtered(engine, len(dropped))
+            for result, reason in dropped:
+                item_log.debug("Dropping %s result (%s): %s", engine, reason, result.title)
+        return kept
+    return apply
+
+def _absolute_msn_link(result):
+    # 确保链接是完整的URL
+    if result.link.startswith('/'):
+        result.link = 'https://www.msn.cn' + result.link
+    return result
+
+# 各搜索引擎结果页的结构，选择器按优先级排列
+BING_SPEC = EngineSpec(
+    containers=['.b_algo'],
+    fields={
+        'title': Field(['h2']),
+        'link': Field(['a'], attr='href'),
+        'snippet': Field(['p']),
+        'image_url': Field(['img'], attr='src'),
+        'time': Field(['.news_dt', '.datetime']),
+    },
+    batch_filter=language_filter('bing'),
+)
+
+MSN_SPEC = EngineSpec(
+    containers=['.contentCard', '.article-card', '.news-card', '.cardContent'],
+    fields={
+        'title': Field(['.title', 'h3', '.headline', 'a[data-t*="title"]']),
+        'link': Field(['a[href*="/news"]', 'a[href*="/zh-cn"]', 'a'], attr='href'),
+        'snippet': Field(['.abstract', '.description', '.caption', 'p']),
+        'image_url': Field(['img'], attr='src'),
+        'time': Field(['.pubtime', '.time', '.datetime']),
+    },
+    fixup=_absolute_msn_link,
+    batch_filter=language_filter('msn'),
+)
+
+BAIDU_SPEC = EngineSpec(
+    containers=['.result.c-container'],
+    fields={
+        'title': Field(['.t', 'h3']),
+        'link': Field(['a'], attr='href'),
+        'snippet': Field(['.c-abstract', '.content']),
+        'image_url': Field(['img'], attr='src'),
+        'time': Field(['.c-abstract-time'], strip=False),
+    },
+    batch_filter=language_filter('baidu'),
+)
+
 def parse_bing_results(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    results = []
-    
-    # 打印调试信息
-    print("Parsing Bing results...")
-    news_items = soup.select('.b_algo')
-    print(f"Found {len(news_items)} news items in Bing HTML")
-    
-    for item in news_items[:10]:
-        try:
-            title_elem = item.find('h2')
-            link_elem = item.find('a')
-            snippet_elem = item.find('p')
-            
-            if title_elem and link_elem:
-                title = title_elem.get_text(strip=True)
-                link = link_elem.get('href', '')
-                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
-                
-                # 检查是否包含日文字符（假名和汉字）
-                if any(ord(c) in range(0x3040, 0x30FF) for c in title + snippet):
-                    print(f"Skipping Japanese result: {title}")
-                    continue
-                
-                # 尝试获取图片
-                image_url = ''
-                img = item.find('img')
-                if img and img.get('src'):
-                    image_url = img.get('src')
-                
-                # 尝试获取时间
-                time = ''
-                time_elem = item.find(class_='news_dt') or item.find(class_='datetime')
-                if time_elem:
-                    time = time_elem.get_text(strip=True)
-                
-                results.append({
-                    'title': title,
-                    'link': link,
-                    'snippet': snippet,
-                    'image_url': image_url,
-                    'time': time
-                })
-                print(f"Successfully parsed Bing result: {title}")
-        except Exception as e:
-            print(f"Error parsing Bing result: {str(e)}")
-            continue
-    
-    return results
+    return parse_html(html, BING_SPEC, ENGINE_MAX_RESULTS)
 
 def parse_msn_results(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    results = []
-    
-    # 打印调试信息
-    print("Parsing MSN results...")
-    
-    # 尝试多个可能的选择器
-    selectors = [
-        '.contentCard',
-        '.article-card',
-        '.news-card',
-        '.cardContent'
-    ]
-    
-    news_items = []
-    for selector in selectors:
-        items = soup.select(selector)
-        if items:
-            print(f"Found {len(items)} items with selector: {selector}")
-            news_items = items
-            break
-    
-    for item in news_items[:10]:
-        try:
-            # 标题可能在不同的标签中
-            title_elem = (
-                item.select_one('.title') or 
-                item.select_one('h3') or 
-                item.select_one('.headline') or
-                item.select_one('a[data-t*="title"]')
-            )
-            
-            # 链接可能在不同位置
-            link_elem = (
-                item.select_one('a[href*="/news"]') or
-                item.select_one('a[href*="/zh-cn"]') or
-                item.select_one('a')
-            )
-            
-            # 摘要可能有不同的类名
-            snippet_elem = (
-                item.select_one('.abstract') or
-                item.select_one('.description') or
-                item.select_one('.caption') or
-                item.select_one('p')
-            )
-            
-            if title_elem and link_elem:
-                title = title_elem.get_text(strip=True)
-                link = link_elem.get('href', '')
-                # 确保链接是完整的URL
-                if link.startswith('/'):
-                    link = 'https://www.msn.cn' + link
-                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
-                
-                # 尝试获取图片
-                image_url = ''
-                img = item.find('img')
-                if img and img.get('src'):
-                    image_url = img.get('src')
-                
-                # 尝试获取时间
-                time = ''
-                time_elem = (
-                    item.select_one('.pubtime') or
-                    item.select_one('.time') or
-                    item.select_one('.datetime')
-                )
-                if time_elem:
-                    time = time_elem.get_text(strip=True)
-                
-                results.append({
-                    'title': title,
-                    'link': link,
-                    'snippet': snippet,
-                    'image_url': image_url,
-                    'time': time
-                })
-                print(f"Successfully parsed MSN result: {title}")
-        except Exception as e:
-            print(f"Error parsing MSN result: {str(e)}")
-            continue
-    
-    return results
+    return parse_html(html, MSN_SPEC, ENGINE_MAX_RESULTS)
+
+def parse_baidu_results(html):
+    return parse_html(html, BAIDU_SPEC, ENGINE_MAX_RESULTS)
+
+def fetch_and_parse(engine, url, headers, spec):
+    """流式下载并解析结果页，拿到 ENGINE_MAX_RESULTS 条结果后不再读取剩余的响应"""
+    response = None
+    try:
+        with metrics.timer('fetch', engine=engine):
+            response = http_session.get(url, headers=headers, timeout=10, stream=True)
+            response.raise_for_status()  # 检查响应状态
+        with metrics.timer('parse', engine=engine):
+            chunks = iter_text(response, ENGINE_MAX_BYTES, ENGINE_READ_TIMEOUT)
+            results = list(iter_results(chunks, spec, ENGINE_MAX_RESULTS))
+        for result in results:
+            item_log.debug("Parsed %s result: %s", engine, result.title)
+        return results, response.status_code
+    finally:
+        if response is not None:
+            response.close()
 
 def search_bing(keyword):
     headers = {
@@ -334,22 +699,14 @@ def search_bing(keyword):
         'Cookie': 'MUID=1234567890; SRCHD=AF=NOFORM; SRCHUID=V=2&GUID=1234567890; SRCHUSR=DOB=20240115'
     }
     # 使用必应中国的搜索 URL，添加参数以获取中文结果
-    url = f"https://cn.bing.com/search?q={keyword}&ensearch=0&FORM=BEHPTB&setmkt=zh-cn&setlang=zh-cn"
+    url = f"{BING_BASE_URL}/search?q={keyword}&ensearch=0&FORM=BEHPTB&setmkt=zh-cn&setlang=zh-cn"
     
     try:
-        print(f"Fetching Bing results for keyword: {keyword}")
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # 检查响应状态
-        print(f"Bing response status: {response.status_code}")
-        
-        # 确保响应是 UTF-8 编码
-        response.encoding = 'utf-8'
-        
-        results = parse_bing_results(response.text)
-        print(f"Found {len(results)} results from Bing")
+        results, status = fetch_and_parse('bing', url, headers, BING_SPEC)
+        log.info("Bing: %d results for %s (HTTP %d)", len(results), keyword, status)
         return results
     except Exception as e:
-        print(f"Error searching Bing: {str(e)}")
+        log.warning("Error searching Bing for %s: %s", keyword, e)
         return []
 
 def search_msn(keyword):
@@ -362,33 +719,30 @@ def search_msn(keyword):
     }
     
     urls = [
-        f"https://www.msn.cn/zh-cn/news/search?q={keyword}",
-        f"https://www.msn.cn/zh-cn/news/searchresults?q={keyword}",
-        f"https://www.msn.cn/zh-cn/search?q={keyword}&category=news"
+        f"{MSN_BASE_URL}/zh-cn/news/search?q={keyword}",
+        f"{MSN_BASE_URL}/zh-cn/news/searchresults?q={keyword}",
+        f"{MSN_BASE_URL}/zh-cn/search?q={keyword}&category=news"
     ]
     
     all_results = []
     for url in urls:
         try:
-            print(f"Trying MSN URL: {url}")
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()  # 检查响应状态
-            print(f"MSN response status: {response.status_code}")
-            results = parse_msn_results(response.text)
+            log.debug("Trying MSN URL: %s", url)
+            results, status = fetch_and_parse('msn', url, headers, MSN_SPEC)
             if results:
-                print(f"Found {len(results)} results from MSN")
+                log.info("MSN: %d results for %s (HTTP %d)", len(results), keyword, status)
                 all_results.extend(results)
                 break
         except Exception as e:
-            print(f"Error searching MSN ({url}): {str(e)}")
+            log.warning("Error searching MSN (%s): %s", url, e)
             continue
     
     # 去重
     seen = set()
     unique_results = []
     for result in all_results:
-        if result['link'] not in seen:
-            seen.add(result['link'])
+        if result.link not in seen:
+            seen.add(result.link)
             unique_results.append(result)
     
     return unique_results[:10]
@@ -567,53 +921,16 @@ TEMPLATE = """
         <div class="update-time">更新至 {{ timestamp }}</div>
     </div>
     <div class="tabs">
-        <div class="tab active">全部 <span class="count">{{ bing_results|length + msn_results|length + baidu_results|length }}</span></div>
-        <div class="tab">Bing <span class="count">{{ bing_results|length }}</span></div>
-        <div class="tab">MSN <span class="count">{{ msn_results|length }}</span></div>
-        <div class="tab">百度 <span class="count">{{ baidu_results|length }}</span></div>
+        <div class="tab active">全部 <span class="count">{{ counts.all }}</span></div>
+        <div class="tab">Bing <span class="count">{{ counts.bing }}</span></div>
+        <div class="tab">MSN <span class="count">{{ counts.msn }}</span></div>
+        <div class="tab">百度 <span class="count">{{ counts.baidu }}</span></div>
     </div>
     <div class="main-container">
         <div class="content">
-            {% if bing_results %}
-            <div class="source-tag">Bing搜索结果</div>
-            {% for result in bing_results %}
-            <div class="news-item">
-                <div class="news-thumbnail" style="background-image: url('{{ result.get('image_url', '') }}')"></div>
-                <div class="news-content">
-                    <div class="news-time">{{ result.get('time', '') }}</div>
-                    <a href="{{ result.link }}" class="news-title" target="_blank">{{ result.title }}</a>
-                    <div class="news-snippet">{{ result.snippet }}</div>
-                </div>
-            </div>
-            {% endfor %}
-            {% endif %}
-
-            {% if msn_results %}
-            <div class="source-tag">MSN搜索结果</div>
-            {% for result in msn_results %}
-            <div class="news-item">
-                <div class="news-thumbnail" style="background-image: url('{{ result.get('image_url', '') }}')"></div>
-                <div class="news-content">
-                    <div class="news-time">{{ result.get('time', '') }}</div>
-                    <a href="{{ result.link }}" class="news-title" target="_blank">{{ result.title }}</a>
-                    <div class="news-snippet">{{ result.snippet }}</div>
-                </div>
-            </div>
-            {% endfor %}
-            {% endif %}
-
-            {% if baidu_results %}
-            <div class="source-tag">百度搜索结果</div>
-            {% for result in baidu_results %}
-            <div class="news-item">
-                <div class="news-thumbnail" style="background-image: url('{{ result.get('image_url', '') }}')"></div>
-                <div class="news-content">
-                    <div class="news-time">{{ result.get('time', '') }}</div>
-                    <a href="{{ result.link }}" class="news-title" target="_blank">{{ result.title }}</a>
-                    <div class="news-snippet">{{ result.snippet }}</div>
-                </div>
-            </div>
-            {% endfor %}
+            {% if counts.all %}
+            <div class="source-tag">综合排序</div>
+            {{ ranked_items }}
             {% endif %}
         </div>
         
@@ -631,45 +948,69 @@ TEMPLATE = """
 </html>
 """
 
+# 单条结果的片段，结果页和预览页共用；渲染结果按内容缓存，模板修改后版本随之变化
+NEWS_ITEM_TEMPLATE = """
+            <div class="news-item">
+                <div class="news-thumbnail" style="background-image: url('{{ result.image_url|thumbnail }}')"></div>
+                <div class="news-content">
+                    <div class="news-time">{{ result.time }}</div>
+                    <a href="{{ result.link }}" class="news-title" target="_blank">{{ result.title }}</a>
+                    <div class="news-snippet">{{ result.snippet }}</div>
+                </div>
+            </div>"""
+NEWS_ITEM_VERSION = template_version(NEWS_ITEM_TEMPLATE + str(THUMBNAIL_PROXY))
+fragment_cache = create_fragment_cache()
+
+def render_news_items(results):
+    """逐条渲染结果，内容相同的结果直接使用缓存的片段"""
+    template = compile_template(NEWS_ITEM_TEMPLATE)
+    return Markup(''.join(
+        fragment_cache.get_or_render(NEWS_ITEM_VERSION, fragment_key(result), lambda: template.render(result=result))
+        for result in results
+    ))
+
 # 修改 generate_results_page 函数，使用 TEMPLATE
-def generate_results_page(keyword, bing_results, msn_results, baidu_results):
-    # 提取时间线事件
-    timeline_events = extract_timeline_events(bing_results, msn_results, baidu_results)
-    
-    # 渲染模板
-    html_content = render_template_string(
-        TEMPLATE,
-        keyword=keyword,
-        bing_results=bing_results,
-        msn_results=msn_results,
-        baidu_results=baidu_results,
-        timeline_events=timeline_events,
-        timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    )
-    
-    # 生成唯一文件名
-    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{keyword}.html"
-    # 同时保存到 EVENTS_DIR 和 GITHUB_PAGES_DIR
-    events_filepath = os.path.join(EVENTS_DIR, filename)
-    github_filepath = os.path.join(GITHUB_PAGES_DIR, filename)
-    
-    # 保存文件
-    with open(events_filepath, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    # 同时保存一份到 GitHub Pages 目录
-    with open(github_filepath, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+def generate_results_page(keyword, results):
+    html_content = render_results_page(keyword, results)
+    page_url = save_results_page(keyword, html_content)
     
     # 更新索引页面
     generate_index_page()
     
-    return f"/static/events/{filename}"
+    return page_url
 
-def generate_preview_page(keyword, bing_results, msn_results):
+def render_results_page(keyword, results, history=None):
     # 提取时间线事件
-    timeline_events = extract_timeline_events(bing_results, msn_results, [])
+    timeline_events = extract_timeline_events(results, history)
+    ranked = rank_results(keyword, results)
+    counts = {engine: 0 for engine in ENGINES}
+    for item in ranked:
+        counts[item.engine] += 1
+    counts['all'] = len(ranked)
+    
+    # 渲染模板
+    with metrics.timer('render'):
+        return render_template_cached(
+            TEMPLATE,
+            keyword=keyword,
+            counts=counts,
+            ranked_items=render_news_items(item.result for item in ranked),
+            timeline_events=timeline_events,
+            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+
+def save_results_page(keyword, html_content, filename=None):
+    # 生成唯一文件名，刷新已有事件时覆盖原文件
+    filename = filename or f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{keyword}.html"
+    # 同时保存到事件页面和 GitHub Pages 页面
+    with metrics.timer('file_write'):
+        event_pages.put(filename, html_content.encode('utf-8'))
+        docs_pages.put(filename, static_page_html(html_content).encode('utf-8'))
     
-    template = """
+    return f"/static/events/{filename}"
+
+# 预览页面由几个片段组成，完整渲染和流式渲染共用同一套模板
+PREVIEW_SHELL_TEMPLATE = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -869,110 +1210,396 @@ def generate_preview_page(keyword, bing_results, msn_results):
             <button class="action-btn publish-btn" onclick="publishEvent()">发布</button>
             <button class="action-btn cancel-btn" onclick="cancelPreview()">取消</button>
         </div>
-
-        <div class="header">
-            <h1>{{ keyword }}</h1>
-            <div class="update-time">更新至 {{ timestamp }}</div>
-        </div>
-        <div class="tabs">
-            <div class="tab active">全部 <span class="count">{{ bing_results|length + msn_results|length }}</span></div>
-            <div class="tab">Bing <span class="count">{{ bing_results|length }}</span></div>
-            <div class="tab">MSN <span class="count">{{ msn_results|length }}</span></div>
-        </div>
-        <div class="main-container">
-            <div class="content">
-                {% if bing_results %}
-                <div class="source-tag">Bing搜索结果</div>
-                {% for result in bing_results %}
-                <div class="news-item">
-                    <div class="news-thumbnail" style="background-image: url('{{ result.get('image_url', '') }}')"></div>
-                    <div class="news-content">
-                        <div class="news-time">{{ result.get('time', '') }}</div>
-                        <a href="{{ result.link }}" class="news-title" target="_blank">{{ result.title }}</a>
-                        <div class="news-snippet">{{ result.snippet }}</div>
-                    </div>
-                </div>
-                {% endfor %}
-                {% endif %}
-
-                {% if msn_results %}
-                <div class="source-tag">MSN搜索结果</div>
-                {% for result in msn_results %}
-                <div class="news-item">
-                    <div class="news-thumbnail" style="background-image: url('{{ result.get('image_url', '') }}')"></div>
-                    <div class="news-content">
-                        <div class="news-time">{{ result.get('time', '') }}</div>
-                        <a href="{{ result.link }}" class="news-title" target="_blank">{{ result.title }}</a>
-                        <div class="news-snippet">{{ result.snippet }}</div>
-                    </div>
-                </div>
-                {% endfor %}
-                {% endif %}
-            </div>
-            
-            <div class="timeline">
-                <h3>事件进展</h3>
-                {% for event in timeline_events %}
-                <div class="timeline-item">
-                    <div class="timeline-time">{{ event.time }}</div>
-                    <div class="timeline-title">{{ event.title }}</div>
-                </div>
-                {% endfor %}
-            </div>
-        </div>
-        
         <script>
             async function publishEvent() {
+                const button = document.querySelector('.publish-btn');
+                button.disabled = true;
                 try {
-                    const response = await fetch('/api/search?keyword={{ keyword }}');
-                    if (response.ok) {
+                    const response = await fetch('/api/search?keyword={{ keyword|urlencode }}&preview_id={{ preview_id }}');
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! status: ${response.status}`);
+                    }
+                    const job = await response.json();
+                    
+                    const onDone = () => {
                         alert('发布成功！');
                         window.location.href = '/dashboard.html';
-                    } else {
+                    };
+                    const onFailed = message => {
+                        console.error('发布失败:', message);
                         alert('发布失败，请重试');
-                    }
+                        button.disabled = false;
+                        button.textContent = '发布';
+                    };
+                    
+                    // 通过 SSE 显示每个阶段的进度
+                    const source = new EventSource(job.events_url);
+                    source.addEventListener('stage', e => {
+                        button.textContent = JSON.parse(e.data).message;
+                    });
+                    source.addEventListener('done', () => {
+                        source.close();
+                        onDone();
+                    });
+                    source.addEventListener('failed', e => {
+                        source.close();
+                        onFailed(JSON.parse(e.data).message);
+                    });
+                    // 连接失败或中断时改为轮询任务状态，任务不存在时恢复按钮
+                    source.onerror = () => {
+                        source.close();
+                        pollJob(job.status_url, onDone, onFailed);
+                    };
                 } catch (error) {
                     console.error('发布失败:', error);
                     alert('发布失败，请重试');
+                    button.disabled = false;
+                }
+            }
+            
+            async function pollJob(statusUrl, onDone, onFailed) {
+                try {
+                    const response = await fetch(statusUrl);
+                    if (!response.ok) {
+                        onFailed(`HTTP error! status: ${response.status}`);
+                        return;
+                    }
+                    const job = await response.json();
+                    if (job.status === 'done') {
+                        onDone();
+                    } else if (job.status === 'failed') {
+                        onFailed(job.error);
+                    } else {
+                        setTimeout(() => pollJob(statusUrl, onDone, onFailed), 1000);
+                    }
+                } catch (error) {
+                    onFailed(error);
                 }
             }
             
             async function cancelPreview() {
                 try {
-                    // 调用删除预览文件的API
-                    await fetch('/api/preview/cancel?keyword={{ keyword }}', {
+                    // 调用删除预览的API
+                    await fetch('/api/preview/cancel?id={{ preview_id }}', {
                         method: 'POST'
                     });
                 } catch (error) {
-                    console.error('删除预览文件失败:', error);
+                    console.error('删除预览失败:', error);
                 }
                 window.location.href = '/dashboard.html';
             }
         </script>
+
+        <div class="header">
+            <h1>{{ keyword }}</h1>
+            <div class="update-time">更新至 {{ timestamp }}</div>
+        </div>
+        <div class="tabs">
+            <div class="tab active">全部 <span class="count" id="count-all">{{ counts.all }}</span></div>
+            <div class="tab">Bing <span class="count" id="count-bing">{{ counts.bing }}</span></div>
+            <div class="tab">MSN <span class="count" id="count-msn">{{ counts.msn }}</span></div>
+        </div>
+        <div class="main-container">
+            <div class="timeline">
+                <h3>事件进展</h3>
+                <div id="timeline-items">{{ timeline_html }}</div>
+            </div>
+            
+            <div class="content">
+"""
+
+PREVIEW_BLOCK_TEMPLATE = """
+                {% if results %}
+                <div class="source-tag">{{ source_name }}搜索结果</div>
+                {{ items }}
+                {% endif %}
+"""
+
+PREVIEW_TIMELINE_TEMPLATE = """
+                {% for event in timeline_events %}
+                <div class="timeline-item">
+                    <div class="timeline-time">{{ event.time }}</div>
+                    <div class="timeline-title">{{ event.title }}</div>
+                </div>
+                {% endfor %}
+"""
+
+PREVIEW_UPDATE_TEMPLATE = """
+                <template id="timeline-{{ engine }}">{{ timeline_html }}</template>
+                <script>
+                    document.getElementById('count-{{ engine }}').textContent = {{ count }};
+                    document.getElementById('count-all').textContent = {{ total }};
+                    document.getElementById('timeline-items').innerHTML = document.getElementById('timeline-{{ engine }}').innerHTML;
+                </script>
+"""
+
+PREVIEW_FOOTER = """
+            </div>
+        </div>
     </body>
     </html>
-    """
-    
-    # 渲染模板
-    html_content = render_template_string(
-        template,
+"""
+
+# 预览时使用的搜索引擎，按完成顺序推送到浏览器
+PREVIEW_ENGINES = [
+    ('bing', 'Bing'),
+    ('msn', 'MSN'),
+]
+
+def render_preview_shell(keyword, preview_id, counts, timeline_events):
+    return render_template_cached(
+        PREVIEW_SHELL_TEMPLATE,
         keyword=keyword,
-        bing_results=bing_results,
-        msn_results=msn_results,
-        timeline_events=timeline_events,
+        preview_id=preview_id,
+        counts=counts,
+        timeline_html=Markup(render_template_cached(PREVIEW_TIMELINE_TEMPLATE, timeline_events=timeline_events)),
         timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     )
+
+def render_preview_block(source_name, results):
+    return render_template_cached(PREVIEW_BLOCK_TEMPLATE, source_name=source_name, results=results,
+                                  items=render_news_items(results))
+
+def generate_preview_page(keyword, results):
+    # 提取时间线事件
+    timeline_events = extract_timeline_events(results)
     
-    # 生成预览文件
-    filename = f"preview_{datetime.now().strftime('%Y%m%d%H%M%S')}_{keyword}.html"
-    filepath = os.path.join(EVENTS_DIR, filename)
+    preview_id = uuid.uuid4().hex
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # 渲染模板
+    counts = {
+        'all': len(results),
+        'bing': len(results.bing),
+        'msn': len(results.msn)
+    }
+    with metrics.timer('render'):
+        html_content = ''.join([
+            render_preview_shell(keyword, preview_id, counts, timeline_events),
+            render_preview_block('Bing', results.bing),
+            render_preview_block('MSN', results.msn),
+            PREVIEW_FOOTER
+        ])
     
-    return f"/static/events/{filename}"
+    # 保存到预览存储，由 /preview/<preview_id> 提供访问
+    preview_store.put(preview_id, keyword, html_content)
+    
+    return f"/preview/{preview_id}"
+
+@app.route('/preview/stream')
+def stream_preview():
+    """流式预览：先输出页面框架，每个搜索引擎完成后立即把它的结果推送给浏览器"""
+    keyword = request.args.get('keyword')
+    if not keyword:
+        return jsonify({'error': 'Keyword is required'}), 400
+    
+    preview_id = uuid.uuid4().hex
+    sources = dict(PREVIEW_ENGINES)
+    # 在带 route 标签的上下文里提交，抓取阶段的指标归到 preview 路由
+    with metrics.route('preview'):
+        context = contextvars.copy_context()
+    futures = {
+        engine_executor.submit(context.copy().run, fetch_results, engine, keyword): engine
+        for engine, _ in PREVIEW_ENGINES
+    }
+    
+    def generate():
+        counts = {'all': '…', 'bing': '…', 'msn': '…'}
+        yield render_preview_shell(keyword, preview_id, counts, [])
+        
+        results = {engine: [] for engine, _ in PREVIEW_ENGINES}
+        timeline = TimelineBuilder()
+        total = 0
+        for future in as_completed(futures):
+            engine = futures[future]
+            try:
+                results[engine] = future.result()
+            except Exception as e:
+                log.warning("Error fetching %s for preview: %s", engine, e)
+            total += len(results[engine])
+            # 只对新到达的结果提取时间线，再与已有条目合并
+            timeline.add(results[engine])
+            yield render_preview_block(sources[engine], results[engine])
+            yield render_template_cached(
+                PREVIEW_UPDATE_TEMPLATE,
+                engine=engine,
+                count=len(results[engine]),
+                total=total,
+                timeline_html=Markup(render_template_cached(PREVIEW_TIMELINE_TEMPLATE, timeline_events=timeline.events()))
+            )
+        yield PREVIEW_FOOTER
+        
+        # 保存完整页面，刷新或稍后打开 /preview/<id> 时不必重新抓取
+        full_counts = {'all': total, 'bing': len(results['bing']), 'msn': len(results['msn'])}
+        html_content = ''.join([
+            render_preview_shell(keyword, preview_id, full_counts, timeline.events()),
+            render_preview_block('Bing', results['bing']),
+            render_preview_block('MSN', results['msn']),
+            PREVIEW_FOOTER
+        ])
+        preview_store.put(preview_id, keyword, html_content)
+    
+    return Response(stream_with_context(generate()), mimetype='text/html', headers={
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'
+    })
+
+# 刷新时间在间隔基础上随机推迟 0~REFRESH_JITTER 比例，避免同时到期
+REFRESH_JITTER = float(os.getenv('REFRESH_JITTER', '0.1'))
+
+def refresh_event(event_id):
+    """重新抓取事件的搜索结果，内容有变化时才重新生成页面、时间线和索引"""
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        tracked = TrackedEvent.query.filter_by(event_id=event_id).first()
+        if event is None or tracked is None:
+            return 'missing'
+        
+        results = ResultSet(*(fetch_results(engine, event.keyword, use_cache=False) for engine in ENGINES))
+        
+        now = datetime.utcnow()
+        tracked.last_checked = now
+        tracked.next_check = now + timedelta(seconds=tracked.interval * random.uniform(1, 1 + REFRESH_JITTER))
+        
+        # 全部抓取失败时保留原页面
+        if not results:
+            db.session.commit()
+            return 'failed'
+        
+        content_hash = results_hash(results)
+        if content_hash == tracked.content_hash:
+            db.session.commit()
+            return 'unchanged'
+        
+        # 记录新版本，时间线同时包含历史上出现过、现在已不在结果中的条目
+        history.record_snapshot(event.id, results)
+        html_content = render_results_page(event.keyword, results, history=history.history_results(event.id))
+        save_results_page(event.keyword, html_content, filename=os.path.basename(event.url))
+        
+        stored = EventResult.query.filter_by(event_id=event.id).first()
+        if stored:
+            stored.results = EventResult.from_results(event.id, results).results
+        else:
+            db.session.add(EventResult.from_results(event.id, results))
+        tracked.content_hash = content_hash
+        tracked.last_changed = now
+        event.timestamp = now
+        db.session.commit()
+        
+        generate_index_page()
+        log.info("事件 %s 内容有更新，已重新生成页面", event.keyword)
+        return 'changed'
+
+def due_tracked_events(limit=50):
+    with app.app_context():
+        rows = TrackedEvent.query.filter(TrackedEvent.next_check <= datetime.utcnow()) \
+            .order_by(TrackedEvent.next_check).limit(limit).all()
+        return [row.event_id for row in rows]
+
+def create_refresh_scheduler():
+    return RefreshScheduler(
+        due_tracked_events,
+        refresh_event,
+        concurrency=int(os.getenv('REFRESH_CONCURRENCY', '2')),
+        jitter=float(os.getenv('REFRESH_START_JITTER', '30')),
+        poll_interval=float(os.getenv('REFRESH_POLL_INTERVAL', '60'))
+    )
+
+@app.route('/api/events/<int:event_id>/track', methods=['POST'])
+def track_event(event_id):
+    """开始定时刷新事件，body 可指定 interval（秒）"""
+    event = Event.query.get_or_404(event_id)
+    data = request.get_json(silent=True) or {}
+    interval = max(int(data.get('interval', 3600)), 60)
+    
+    tracked = TrackedEvent.query.filter_by(event_id=event.id).first()
+    if tracked is None:
+        tracked = TrackedEvent(event_id=event.id)
+        # 以发布时保存的结果作为基准，未变化的第一次刷新不会重新生成页面
+        stored = EventResult.query.filter_by(event_id=event.id).first()
+        if stored:
+            tracked.content_hash = results_hash(stored.load())
+        db.session.add(tracked)
+    tracked.interval = interval
+    tracked.next_check = datetime.utcnow() + timedelta(seconds=interval)
+    db.session.commit()
+    return jsonify({'success': True, 'tracked': tracked.to_dict()})
+
+@app.route('/api/events/<int:event_id>/track', methods=['DELETE'])
+def untrack_event(event_id):
+    TrackedEvent.query.filter_by(event_id=event_id).delete()
+    db.session.commit()
+    return jsonify({'success': True})
+
+@app.route('/api/events/<int:event_id>/refresh', methods=['POST'])
+def refresh_event_now(event_id):
+    """立即刷新一个已跟踪的事件"""
+    if not TrackedEvent.query.filter_by(event_id=event_id).first():
+        return jsonify({'error': 'Event is not tracked'}), 404
+    try:
+        job = job_manager.submit('refresh', lambda job: {'status': refresh_event(event_id)},
+                                 description=str(event_id))
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'job_id': job.id, 'status_url': f'/api/jobs/{job.id}'}), 202
+
+@app.cli.command('refresh-scheduler')
+@click.option('--once', is_flag=True, help='只刷新当前到期的事件，然后退出')
+def refresh_scheduler_command(once):
+    """定时刷新已跟踪的事件（整个部署只需运行一个）"""
+    ensure_db()
+    scheduler = create_refresh_scheduler()
+    if once:
+        click.echo(f"已刷新 {scheduler.run_once()} 个到期事件")
+        scheduler.stop(wait=True)
+        return
+    scheduler.start()
+    click.echo('刷新调度已启动，Ctrl+C 退出')
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda sig, frame: stop.set())
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop(wait=True)
+
+@app.route('/api/events/<int:event_id>/history')
+def event_history(event_id):
+    """事件的所有历史版本"""
+    Event.query.get_or_404(event_id)
+    return jsonify([snapshot.to_dict() for snapshot in history.list_versions(event_id)])
+
+@app.route('/api/events/<int:event_id>/history/<int:version>')
+def event_version(event_id, version):
+    """重建指定版本的搜索结果"""
+    state = history.load_version(event_id, version)
+    if state is None:
+        return jsonify({'error': 'Version not found'}), 404
+    return jsonify({'version': version, 'results': state})
+
+@app.route('/api/events/<int:event_id>/history/diff')
+def event_history_diff(event_id):
+    """比较两个版本：/api/events/<id>/history/diff?from=1&to=3"""
+    from_version = request.args.get('from', type=int)
+    to_version = request.args.get('to', type=int)
+    if from_version is None or to_version is None:
+        return jsonify({'error': 'from and to are required'}), 400
+    delta = history.diff_versions(event_id, from_version, to_version)
+    if delta is None:
+        return jsonify({'error': 'Version not found'}), 404
+    return jsonify({'from': from_version, 'to': to_version, 'diff': delta})
+
+@app.route('/api/events/<int:event_id>/history/compact', methods=['POST'])
+def compact_event_history(event_id):
+    """只保留最近 keep 个版本"""
+    keep = max(request.args.get('keep', history.MAX_CHAIN, type=int), 1)
+    removed = history.compact(event_id, keep)
+    db.session.commit()
+    return jsonify({'success': True, 'removed': removed})
 
 @app.route('/api/events/<int:event_id>/notion', methods=['POST'])
+@metrics.instrument('add_to_notion')
 def add_to_notion(event_id):
     event = Event.query.get_or_404(event_id)
     
@@ -984,74 +1611,221 @@ def add_to_notion(event_id):
         }), 400
     
     try:
-        # 重新获取搜索结果
-        bing_results = search_bing(event.keyword)
-        msn_results = search_msn(event.keyword)
+        # 优先使用发布时保存的搜索结果，旧事件才重新抓取
+        stored = EventResult.query.filter_by(event_id=event.id).first()
+        if stored:
+            results = stored.load()
+        else:
+            results = ResultSet(bing=search_bing(event.keyword), msn=search_msn(event.keyword))
         
         # 创建 Notion 页面
-        content = format_content_for_notion(event.keyword, bing_results, msn_results, [])
+        content = format_content_for_notion(event.keyword, results)
         
         # 确保 URL 是完整的
         full_url = request.host_url.rstrip('/') + event.url
         
         # 添加错误处理和日志
-        print(f"Creating Notion page for event {event_id}")
-        print(f"Content length: {len(content)}")
-        print(f"URL: {full_url}")
+        log.info("Creating Notion page for event %s (%d blocks, %s)", event_id, len(content), full_url)
         
-        notion_page_id = notion_manager.create_page(
-            title=event.keyword,
-            content=content,
-            url=full_url
-        )
+        with metrics.timer('notion'):
+            notion_page_id = get_notion_manager().create_page(
+                title=event.keyword,
+                content=content,
+                url=full_url
+            )
         
         if notion_page_id:
             # 更新事件记录
             event.notion_page_id = notion_page_id
-            db.session.commit()
+            with metrics.timer('db'):
+                db.session.commit()
             
             return jsonify({
                 'success': True,
                 'message': '成功添加到 Notion'
             })
         else:
+            metrics.record_error('notion')
             return jsonify({
                 'success': False,
                 'message': '添加到 Notion 失败：无法创建页面'
             }), 500
             
     except Exception as e:
-        print(f"Error adding to Notion: {str(e)}")
+        log.exception("Error adding to Notion: %s", e)
         return jsonify({
             'success': False,
             'message': f'添加到 Notion 失败: {str(e)}'
         }), 500
 
+@app.route('/api/health')
+def health():
+    """各子系统状态；deep=1 时才会访问 Notion"""
+    status = {'database': 'ok', 'notion': 'not_initialized', 'parsers': 'ok'}
+    healthy = True
+
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception as e:
+        status['database'] = f'error: {str(e)}'
+        healthy = False
+
+    if not NOTION_TOKEN or not NOTION_DATABASE_ID:
+        status['notion'] = 'not_configured'
+    elif request.args.get('deep'):
+        try:
+            get_notion_manager().ensure_database()
+            status['notion'] = 'ok'
+        except Exception as e:
+            status['notion'] = f'error: {str(e)}'
+    elif _notion_manager is not None:
+        last_error = _notion_manager.last_error
+        status['notion'] = f'error: {last_error}' if last_error else 'ok'
+
+    return jsonify({'healthy': healthy, 'subsystems': status}), 200 if healthy else 503
+
+@app.route('/api/notion/stats')
+def notion_stats():
+    """Notion 请求队列深度、限流次数和数据库缓存命中情况"""
+    return jsonify(get_notion_manager().stats())
+
+@app.route('/api/profiles')
+def list_profiles():
+    """已保存的请求分析结果，需要 X-Profile-Token"""
+    if not profiler.authorized(request.headers):
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(profiler.list())
+
+@app.route('/api/profiles/<path:filename>')
+def download_profile(filename):
+    if not profiler.authorized(request.headers):
+        return jsonify({'error': 'Not found'}), 404
+    return send_from_directory(os.path.abspath(profiler.directory), filename, as_attachment=True)
+
+@app.route('/thumbs/<key>')
+def thumbnail(key):
+    """缩略图，第一次访问时下载原图并缩放，之后直接返回缓存文件"""
+    if not is_thumbnail_key(key):
+        return jsonify({'error': 'Not found'}), 404
+    found = thumbnail_cache.get(key)
+    if found is None:
+        response = jsonify({'error': 'Not found'})
+        response.status_code = 404
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response
+    path, mimetype = found
+    response = send_from_directory(os.path.abspath(os.path.dirname(path)), os.path.basename(path), mimetype=mimetype,
+                                   max_age=365 * 24 * 3600)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式的阶段耗时、错误数和结果数量（当前 worker 进程）"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.cli.command('notion-backfill')
+@click.option('--base-url', default=lambda: os.getenv('SITE_URL', 'http://localhost:5000'),
+              help='事件页面的站点地址，用于生成 Notion 页面中的链接')
+@click.option('--workers', default=4, show_default=True, help='并发数（仍受 Notion 限流约束）')
+@click.option('--reconcile', is_flag=True, help='同时校验已有 notion_page_id 是否仍然存在')
+@click.option('--verify-max-age', default=3600, show_default=True,
+              help='中断后重新运行时，这么多秒内确认过的页面不再重复校验')
+@click.option('--rescrape', is_flag=True, help='没有保存搜索结果的旧事件重新抓取')
+@click.option('--checkpoint', 'checkpoint_path', default=None, help='进度文件路径')
+def notion_backfill(base_url, workers, reconcile, verify_max_age, rescrape, checkpoint_path):
+    """把 notion_page_id 为空的事件批量补发到 Notion"""
+    ensure_db()
+    notion_manager = get_notion_manager()
+    os.makedirs(app.instance_path, exist_ok=True)
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(app.instance_path, 'notion_backfill.json'))
+
+    if reconcile:
+        published = Event.query.filter(Event.notion_page_id.isnot(None)).all()
+        missing = verify_pages(notion_manager, [(e.id, e.notion_page_id) for e in published], checkpoint, workers,
+                               max_age=verify_max_age)
+        for event_id in missing:
+            db.session.get(Event, event_id).notion_page_id = None
+        db.session.commit()
+        click.echo(f"校验 {len(published)} 个页面，{len(missing)} 个已失效")
+
+    jobs = []
+    skipped = 0
+    for event in Event.query.filter(Event.notion_page_id.is_(None)).order_by(Event.id).all():
+        stored = EventResult.query.filter_by(event_id=event.id).first()
+        if stored:
+            results = stored.load()
+        elif rescrape:
+            results = ResultSet(bing=search_bing(event.keyword), msn=search_msn(event.keyword))
+        else:
+            skipped += 1
+            continue
+        content = format_content_for_notion(event.keyword, results)
+        jobs.append((event.id, event.keyword, content, base_url.rstrip('/') + event.url))
+
+    def on_created(event_id, page_id):
+        db.session.get(Event, event_id).notion_page_id = page_id
+        db.session.commit()
+
+    report = publish_pages(notion_manager, jobs, checkpoint, on_created, workers)
+    click.echo(f"补发完成: 新建 {report['created']}，恢复 {report['resumed']}，"
+               f"失败 {report['failed']}，无保存结果跳过 {skipped}")
+    if not report['failed']:
+        checkpoint.clear()
+
+class _EchoReporter:
+    """命令行下直接打印每个阶段"""
+    
+    def report(self, stage, message, data=None):
+        click.echo(message)
+
+@app.cli.command('batch-publish')
+@click.argument('keywords', nargs=-1)
+@click.option('--file', 'keyword_file', type=click.File('r', encoding='utf-8'), help='每行一个关键词的文件')
+@click.option('--base-url', default=lambda: os.getenv('SITE_URL', 'http://localhost:5000'),
+              help='事件页面的站点地址，用于生成 Notion 页面中的链接')
+@click.option('--concurrency', default=4, show_default=True, type=click.IntRange(min=1),
+              help=f'同时发布的关键词数，最多 {MAX_BATCH_CONCURRENCY}')
+@click.option('--engine-concurrency', default=2, show_default=True, type=click.IntRange(min=1),
+              help=f'每个搜索引擎的并发请求数，最多 {MAX_ENGINE_CONCURRENCY}')
+@click.option('--report', 'report_path', default=None, help='把结果报告写入 JSON 文件')
+def batch_publish_command(keywords, keyword_file, base_url, concurrency, engine_concurrency, report_path):
+    """批量发布关键词"""
+    ensure_db()
+    keywords = parse_keywords(list(keywords) + (keyword_file.read().splitlines() if keyword_file else []))
+    if not keywords:
+        raise click.UsageError('请提供关键词或 --file')
+    
+    report = run_batch(_EchoReporter(), keywords, base_url.rstrip('/') + '/', concurrency, engine_concurrency)
+    for item in report['results']:
+        detail = item.get('url') or item.get('error', '')
+        click.echo(f"{item['status']:>6}  {item['seconds']:>7}s  {item['keyword']}  {detail}")
+    click.echo(f"共 {report['total']} 个，成功 {report['succeeded']}，失败 {report['failed']}")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
 def delete_preview_files():
-    """删除所有预览文件"""
-    for filename in os.listdir(EVENTS_DIR):
-        if filename.startswith('preview_'):
-            file_path = os.path.join(EVENTS_DIR, filename)
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"删除预览文件失败: {file_path}, 错误: {str(e)}")
+    """清理旧版本遗留在 events 目录中的预览文件"""
+    try:
+        event_pages.delete_many(event_pages.list('preview_'))
+    except Exception as e:
+        log.warning("删除预览文件失败: %s", e)
 
-def delete_preview_file(keyword):
-    """删除特定关键词的预览文件"""
-    for filename in os.listdir(EVENTS_DIR):
-        if filename.startswith('preview_') and keyword in filename:
-            file_path = os.path.join(EVENTS_DIR, filename)
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"删除预览文件失败: {file_path}, 错误: {str(e)}")
+@app.route('/preview/<preview_id>')
+def show_preview(preview_id):
+    item = preview_store.get(preview_id)
+    if item is None:
+        return '预览已过期或不存在，请重新生成', 404
+    keyword, html_content = item
+    return html_content, 200, {'Content-Type': 'text/html; charset=utf-8', 'Cache-Control': 'no-store'}
 
 @app.route('/api/preview/cancel', methods=['POST'])
 def cancel_preview():
-    keyword = request.args.get('keyword')
-    if keyword:
-        delete_preview_file(keyword)
+    preview_id = request.args.get('id')
+    if preview_id:
+        preview_store.delete(preview_id)
     return jsonify({'success': True})
 
 def search_baidu(keyword):
@@ -1060,126 +1834,123 @@ def search_baidu(keyword):
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
     }
-    url = f"https://www.baidu.com/s?wd={keyword}"
+    url = f"{BAIDU_BASE_URL}/s?wd={keyword}"
     try:
-        response = requests.get(url, headers=headers)
-        return parse_baidu_results(response.text)
-    except:
+        results, _ = fetch_and_parse('baidu', url, headers, BAIDU_SPEC)
+        return results
+    except Exception as e:
+        log.warning("Error searching Baidu for %s: %s", keyword, e)
         return []
 
-def parse_baidu_results(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    results = []
-    for item in soup.select('.result.c-container')[:10]:
-        title_elem = item.select_one('.t') or item.select_one('h3')
-        link_elem = item.select_one('a')
-        abstract_elem = item.select_one('.c-abstract') or item.select_one('.content')
-        
-        if title_elem and link_elem:
-            title = title_elem.get_text(strip=True)
-            link = link_elem.get('href', '')
-            snippet = abstract_elem.get_text(strip=True) if abstract_elem else ''
-            
-            # 尝试获取图片
-            image_url = ''
-            img = item.find('img')
-            if img and img.get('src'):
-                image_url = img.get('src')
-            
-            # 尝试获取时间
-            time = ''
-            time_elem = item.find(class_='c-abstract-time')
-            if time_elem:
-                time = time_elem.get_text()
-            
-            results.append({
-                'title': title,
-                'link': link,
-                'snippet': snippet,
-                'image_url': image_url,
-                'time': time
-            })
-    return results
+# 常见的时间格式
+TIME_PATTERNS = [re.compile(pattern) for pattern in [
+    r'(\d{4})年(\d{1,2})月(\d{1,2})日',
+    r'(\d{4})\.(\d{1,2})\.(\d{1,2})',
+    r'(\d{4})-(\d{1,2})-(\d{1,2})',
+    r'(\d{1,2})月(\d{1,2})日',
+    r'昨天',
+    r'今天',
+    r'(\d+)小时前',
+    r'(\d+)分钟前'
+]]
 
-def extract_timeline_events(bing_results, msn_results, baidu_results):
-    all_events = []
+def extract_timeline_event(result):
+    """从单条结果中提取时间线条目，没有时间信息时返回 None"""
+    # 尝试从标题中提取时间信息
+    title = result.title
+    snippet = result.snippet
     
-    # 从所有结果中提取带时间的事件
-    for result in bing_results + msn_results + baidu_results:
-        # 尝试从标题中提取时间信息
-        title = result.get('title', '')
-        snippet = result.get('snippet', '')
-        
-        # 首先使用已有的时间
-        time = result.get('time', '')
-        
-        # 如果没有时间，尝试从标题和摘要中提取时间信息
-        if not time:
-            # 常见的时间格式
-            time_patterns = [
-                r'(\d{4})年(\d{1,2})月(\d{1,2})日',
-                r'(\d{4})\.(\d{1,2})\.(\d{1,2})',
-                r'(\d{4})-(\d{1,2})-(\d{1,2})',
-                r'(\d{1,2})月(\d{1,2})日',
-                r'昨天',
-                r'今天',
-                r'(\d+)小时前',
-                r'(\d+)分钟前'
-            ]
-            
-            for pattern in time_patterns:
-                # 先从标题中查找
-                match = re.search(pattern, title)
-                if not match:
-                    # 如果标题中没有，从摘要中查找
-                    match = re.search(pattern, snippet)
-                
-                if match:
-                    time = match.group(0)
-                    break
-        
-        if time:
-            # 处理相对时间
-            if '小时前' in time:
-                hours = int(re.search(r'(\d+)', time).group(1))
-                event_time = datetime.now() - timedelta(hours=hours)
-                time = event_time.strftime('%Y年%m月%d日')
-            elif '分钟前' in time:
-                minutes = int(re.search(r'(\d+)', time).group(1))
-                event_time = datetime.now() - timedelta(minutes=minutes)
-                time = event_time.strftime('%Y年%m月%d日')
-            elif '昨天' in time:
-                event_time = datetime.now() - timedelta(days=1)
-                time = event_time.strftime('%Y年%m月%d日')
-            elif '今天' in time:
-                time = datetime.now().strftime('%Y年%m月%d日')
-            
-            # 如果时间只有月日，添加当前年份
-            if re.match(r'^\d{1,2}月\d{1,2}日', time):
-                time = f"{datetime.now().year}年{time}"
-            
-            all_events.append({
-                'time': time,
-                'title': title
-            })
+    # 首先使用已有的时间
+    time = result.time
     
-    # 按时间排序（将时间字符串转换为datetime对象进行比较）
-    def parse_time(time_str):
-        try:
-            # 尝试解析完整的年月日时间
-            match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', time_str)
+    # 如果没有时间，尝试从标题和摘要中提取时间信息
+    if not time:
+        for pattern in TIME_PATTERNS:
+            # 先从标题中查找
+            match = pattern.search(title)
+            if not match:
+                # 如果标题中没有，从摘要中查找
+                match = pattern.search(snippet)
+            
             if match:
-                year, month, day = map(int, match.groups())
-                return datetime(year, month, day)
-            return datetime.now()  # 如果无法解析，返回当前时间
-        except:
-            return datetime.now()
+                time = match.group(0)
+                break
+    
+    if not time:
+        return None
     
-    # 按时间排序，最新的在前面
-    all_events.sort(key=lambda x: parse_time(x['time']), reverse=True)
+    # 处理相对时间
+    if '小时前' in time:
+        hours = int(re.search(r'(\d+)', time).group(1))
+        event_time = datetime.now() - timedelta(hours=hours)
+        time = event_time.strftime('%Y年%m月%d日')
+    elif '分钟前' in time:
+        minutes = int(re.search(r'(\d+)', time).group(1))
+        event_time = datetime.now() - timedelta(minutes=minutes)
+        time = event_time.strftime('%Y年%m月%d日')
+    elif '昨天' in time:
+        event_time = datetime.now() - timedelta(days=1)
+        time = event_time.strftime('%Y年%m月%d日')
+    elif '今天' in time:
+        time = datetime.now().strftime('%Y年%m月%d日')
     
-    # 返回前10个事件
-    return all_events[:10]
+    # 如果时间只有月日，添加当前年份
+    if re.match(r'^\d{1,2}月\d{1,2}日', time):
+        time = f"{datetime.now().year}年{time}"
+    
+    return {
+        'time': time,
+        'title': title
+    }
+
+def parse_timeline_time(time_str):
+    """将时间字符串转换为datetime对象用于排序"""
+    try:
+        # 尝试解析完整的年月日时间
+        match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', time_str)
+        if match:
+            year, month, day = map(int, match.groups())
+            return datetime(year, month, day)
+        return datetime.now()  # 如果无法解析，返回当前时间
+    except:
+        return datetime.now()
+
+class TimelineBuilder:
+    """增量构建时间线：每批结果到达时只解析新结果，再与已有条目合并排序"""
+    
+    def __init__(self, limit=10):
+        self.limit = limit
+        self._entries = []
+    
+    def add(self, results):
+        for result in results:
+            event = extract_timeline_event(result)
+            if event:
+                self._entries.append((parse_timeline_time(event['time']), event))
+    
+    def events(self):
+        # 按时间排序，最新的在前面，返回前 limit 个事件（相同时间和标题只保留一条）
+        ordered = sorted(self._entries, key=lambda entry: entry[0], reverse=True)
+        events = []
+        seen = set()
+        for _, event in ordered:
+            key = (event['time'], event['title'])
+            if key in seen:
+                continue
+            seen.add(key)
+            events.append(event)
+            if len(events) >= self.limit:
+                break
+        return events
+
+def extract_timeline_events(results, history=None):
+    """results 为 ResultSet；history 为该事件历史版本中出现过的结果，已从当前结果中消失的进展也会保留在时间线上"""
+    with metrics.timer('timeline'):
+        timeline = TimelineBuilder()
+        timeline.add(results)
+        if history:
+            timeline.add(history)
+        return timeline.events()
 
 def generate_index_page():
     """生成 GitHub Pages 的索引页面"""
@@ -1247,28 +2018,37 @@ def generate_index_page():
     """
     
     # 保存索引页面
-    with open(os.path.join(GITHUB_PAGES_DIR, 'index.html'), 'w', encoding='utf-8') as f:
-        f.write(index_html)
+    docs_pages.put('index.html', index_html)
 
 if __name__ == '__main__':
-    init_db()  # 初始化数据库
-    delete_preview_files()  # 删除所有预览文件
+    ensure_db()  # 初始化数据库
+    delete_preview_files()  # 清理旧版本遗留的预览文件
    
     # 如果是在 GitHub Actions 中运行
     if os.getenv('GITHUB_ACTIONS'):
-        # 生成所有页面
-        events = Event.query.all()
-        for event in events:
-            # 直接从数据库生成静态页面
-            with open(os.path.join(EVENTS_DIR, os.path.basename(event.url)), 'r', encoding='utf-8') as f:
-                content = f.read()
-            # 保存到 GitHub Pages 目录
-            with open(os.path.join(GITHUB_PAGES_DIR, os.path.basename(event.url)), 'w', encoding='utf-8') as f:
-                f.write(content)
-        # 生成索引页面
-        generate_index_page()
-        print("静态页面生成完成")
+        with app.app_context():
+            # 生成所有页面
+            events = Event.query.all()
+            pages = []
+            for event in events:
+                filename = os.path.basename(event.url)
+                content = event_pages.get(filename)
+                if content is None:
+                    log.warning("事件页面不存在: %s", filename)
+                    continue
+                pages.append((filename, static_page_html(content.decode('utf-8')).encode('utf-8')))
+            # 批量保存到 GitHub Pages 目录
+            docs_pages.put_many(pages)
+            # 生成索引页面
+            generate_index_page()
+        log.info("静态页面生成完成")
         sys.exit(0)
     else:
-        # 正常运行应用
+        # 注册信号处理器
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+        # 开发时可以在同一进程中运行刷新调度
+        if os.getenv('REFRESH_SCHEDULER') and os.getenv('WERKZEUG_RUN_MAIN'):
+            create_refresh_scheduler().start()
+        # 开发模式运行应用，生产环境使用 python serve.py
         app.run(debug=True) 
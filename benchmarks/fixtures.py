@@ -0,0 +1,174 @@
+"""搜索引擎结果页样本，供离线基准使用
+
+用法：
+    python benchmarks/fixtures.py                 重新生成 benchmarks/fixtures/ 下的合成样本
+    python benchmarks/fixtures.py --record 关键词  抓取真实结果页保存为样本（需要网络）
+
+合成样本按各解析器使用的选择器构造，并混入真实页面中常见的内联脚本、样式和导航标记，
+使页面大小和结构接近真实结果页；固定随机种子，每次生成的内容一致。
+"""
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ENGINES = ('bing', 'msn', 'baidu')
+
+WORDS = ('人工智能', '大模型', '发布', '开源', '芯片', '算力', '训练', '推理', '多模态', '智能体',
+         '融资', '监管', '数据中心', '机器人', '自动驾驶', '研究团队', '最新', '合作', '基准测试', '参数')
+TIMES = ('2024年3月%d日', '2024-03-%02d', '%d小时前', '3月%d日', '昨天', '')
+
+
+def fixture_path(engine):
+    return os.path.join(FIXTURES_DIR, f'{engine}.html')
+
+
+def load_fixture(engine):
+    with open(fixture_path(engine), encoding='utf-8') as f:
+        return f.read()
+
+
+def _sentence(rng, n):
+    return ''.join(rng.choice(WORDS) for _ in range(n)) + '。'
+
+
+def _time(rng):
+    fmt = rng.choice(TIMES)
+    return fmt % rng.randint(1, 28) if '%' in fmt else fmt
+
+
+def _noise(rng, kb):
+    """真实结果页里大量与结果无关的内联脚本和样式"""
+    parts = []
+    size = 0
+    while size < kb * 1024:
+        if rng.random() < 0.5:
+            chunk = '<script>var _w=window;' + ''.join(
+                f'_w.c{rng.randint(0, 1 << 20)}=function(a){{return a*{rng.randint(1, 99)}}};' for _ in range(40)
+            ) + '</script>'
+        else:
+            chunk = '<style>' + ''.join(
+                f'.c{rng.randint(0, 1 << 20)}{{margin:{rng.randint(0, 9)}px;color:#{rng.randint(0, 0xffffff):06x}}}'
+                for _ in range(40)
+            ) + '</style>'
+        parts.append(chunk)
+        size += len(chunk)
+    return ''.join(parts)
+
+
+def _nav(rng, links):
+    return '<ul class="nav">' + ''.join(
+        f'<li><a href="/s?q={rng.randint(0, 9999)}">{rng.choice(WORDS)}</a></li>' for _ in range(links)
+    ) + '</ul>'
+
+
+def bing_html(rng, items=12):
+    results = []
+    for i in range(items):
+        title = _sentence(rng, 4)
+        if i == 5:
+            # 日文结果，解析时应被跳过
+            title = 'オープンソースのモデルを発表'
+        time = _time(rng)
+        results.append(
+            f'<li class="b_algo"><div class="b_title"><h2><a href="https://news.example.com/bing/{i}">{title}</a></h2></div>'
+            f'<div class="b_caption"><p>{_sentence(rng, 18)}</p>'
+            + (f'<span class="news_dt">{time}</span>' if time else '')
+            + f'<img src="https://th.example.com/bing/{i}.jpg"/></div></li>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>必应</title>' + _noise(rng, 150) + '</head><body>'
+        + _nav(rng, 60) + '<ol id="b_results">' + ''.join(results) + '</ol>'
+        + _nav(rng, 40) + _noise(rng, 60) + '</body></html>'
+    )
+
+
+def msn_html(rng, items=12):
+    results = []
+    for i in range(items):
+        time = _time(rng)
+        results.append(
+            f'<div class="contentCard"><a href="/zh-cn/news/technology/{i}">'
+            f'<h3 class="title">{_sentence(rng, 4)}</h3></a>'
+            f'<div class="abstract">{_sentence(rng, 16)}</div>'
+            + (f'<span class="pubtime">{time}</span>' if time else '')
+            + f'<img src="https://img-s-msn-com.example.com/{i}.jpg"/></div>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>MSN</title>' + _noise(rng, 200) + '</head><body>'
+        + _nav(rng, 80) + '<div class="feed">' + ''.join(results) + '</div>'
+        + _noise(rng, 80) + '</body></html>'
+    )
+
+
+def baidu_html(rng, items=12):
+    results = []
+    for i in range(items):
+        time = _time(rng)
+        results.append(
+            f'<div class="result c-container" id="{i + 1}"><h3 class="t">'
+            f'<a href="https://www.baidu.com/link?url={rng.randint(0, 1 << 30)}">{_sentence(rng, 4)}</a></h3>'
+            f'<div class="c-abstract">'
+            + (f'<span class="c-abstract-time">{time}</span>' if time else '')
+            + f'{_sentence(rng, 20)}</div><img src="https://t.example.com/baidu/{i}.jpg"/></div>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>百度</title>' + _noise(rng, 120) + '</head><body>'
+        + _nav(rng, 50) + '<div id="content_left">' + ''.join(results) + '</div>'
+        + _noise(rng, 60) + '</body></html>'
+    )
+
+
+GENERATORS = {'bing': bing_html, 'msn': msn_html, 'baidu': baidu_html}
+
+
+def generate(seed=2024):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for engine in ENGINES:
+        html = GENERATORS[engine](random.Random(f'{seed}-{engine}'))
+        with open(fixture_path(engine), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f'{engine}: {len(html.encode("utf-8")) // 1024} KB -> {fixture_path(engine)}')
+
+
+def record(keyword):
+    """用应用自身的抓取配置保存真实结果页"""
+    sys.path.insert(0, ROOT)
+    import app
+
+    captured = {}
+    get = app.http_session.get
+
+    def capture(url, *args, **kwargs):
+        response = get(url, *args, **kwargs)
+        for engine in ENGINES:
+            if engine in url and engine not in captured:
+                response.encoding = 'utf-8'
+                captured[engine] = response.text
+        return response
+
+    app.http_session.get = capture
+    for engine in ENGINES:
+        getattr(app, f'search_{engine}')(keyword)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for engine, html in captured.items():
+        with open(fixture_path(engine), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f'{engine}: {len(html.encode("utf-8")) // 1024} KB -> {fixture_path(engine)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--record', metavar='KEYWORD', help='抓取真实结果页代替合成样本')
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+    if args.record:
+        record(args.record)
+    else:
+        generate(args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""端到端压测：启动本地模拟的搜索引擎和 Notion，用生产入口（serve.py）运行应用并施加并发请求
+
+用法：python benchmarks/loadtest.py [--concurrency 16] [--duration 30] [--mix preview=5,search=1,events=4]
+                                   [--latency 0.2] [--error-rate 0.02] [--captcha-rate 0.02]
+                                   [--notion-rate 3] [--workers 1] [--threads 16] [--json]
+
+应用在临时目录和临时数据库中运行，所有外部请求都指向模拟服务，不会访问真实的搜索引擎或 Notion。
+search 同时统计提交耗时（search）和发布完成耗时（search_job）。预览和任务状态保存在临时目录的
+SQLite 文件中，多个 worker 时也能跟踪 search_job。
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stubs import start_stubs  # noqa: E402
+
+KEYWORDS = ['大模型', '开源模型', '智能体', '多模态', 'AI 芯片', '算力', '自动驾驶', '机器人',
+            '推理加速', '数据中心', 'AI 监管', '融资', '基准测试', '长上下文', '代码生成', '具身智能']
+
+
+def _session():
+    # 只访问本机，忽略环境中的代理设置
+    session = requests.Session()
+    session.trust_env = False
+    return session
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # 操作 -> [(耗时, 是否成功)]
+        self._lock = threading.Lock()
+
+    def add(self, op, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(op, []).append((seconds, ok))
+
+    def summary(self, elapsed):
+        report = {}
+        for op, samples in sorted(self.samples.items()):
+            latencies = [s for s, _ in samples]
+            errors = sum(1 for _, ok in samples if not ok)
+            report[op] = {
+                'requests': len(samples),
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'error_rate': round(errors / len(samples), 4),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                'p90_ms': round(percentile(latencies, 90) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+                'max_ms': round(max(latencies) * 1000, 1),
+            }
+        return report
+
+
+def start_app(workdir, stub_env, args):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(stub_env)
+    env.update({
+        'PYTHONPATH': ROOT,
+        'WEB_BIND': f'127.0.0.1:{port}',
+        'WEB_WORKERS': str(args.workers),
+        'WEB_THREADS': str(args.threads),
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'loadtest.db'),
+        'PREVIEW_STORE': 'sqlite:///' + os.path.join(workdir, 'previews.db'),
+        'JOB_STORE': 'sqlite:///' + os.path.join(workdir, 'jobs.db'),
+        'FETCH_CACHE_TTL': str(args.cache_ttl),
+        'LOG_LEVEL': env.get('LOG_LEVEL', 'WARNING'),
+        'NO_PROXY': '127.0.0.1,localhost',
+        'no_proxy': '127.0.0.1,localhost',
+    })
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py')],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    session = _session()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'应用启动失败，日志见 {log.name}')
+        try:
+            if session.get(base_url + '/api/health', timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('应用启动超时')
+
+
+def stop_app(process, timeout=30):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        op, _, weight = part.partition('=')
+        weights[op.strip()] = float(weight or 1)
+    unknown = set(weights) - {'preview', 'search', 'events'}
+    if unknown:
+        raise SystemExit(f'unknown operations in --mix: {", ".join(sorted(unknown))}')
+    return weights
+
+
+def run_load(base_url, args, recorder):
+    weights = parse_mix(args.mix)
+    ops, op_weights = list(weights), list(weights.values())
+    deadline = time.monotonic() + args.duration
+
+    def timed(session, op, method, path, ok_status=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=args.timeout, **kwargs)
+            ok = response.status_code in ok_status
+        except requests.RequestException:
+            response, ok = None, False
+        recorder.add(op, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def wait_job(session, status_url, started):
+        while time.monotonic() < deadline + args.timeout:
+            try:
+                job = session.get(base_url + status_url, timeout=args.timeout).json()
+            except (requests.RequestException, ValueError):
+                break
+            if job.get('status') in ('done', 'failed'):
+                recorder.add('search_job', time.perf_counter() - started, job['status'] == 'done')
+                return
+            time.sleep(args.poll_interval)
+        recorder.add('search_job', time.perf_counter() - started, False)
+
+    def client():
+        session = _session()
+        while time.monotonic() < deadline:
+            op = random.choices(ops, op_weights)[0]
+            keyword = random.choice(KEYWORDS)
+            if op == 'preview':
+                timed(session, op, 'GET', '/api/preview', params={'keyword': keyword})
+            elif op == 'events':
+                timed(session, op, 'GET', '/api/events')
+            else:
+                started = time.perf_counter()
+                response = timed(session, op, 'GET', '/api/search', ok_status=(202,), params={'keyword': keyword})
+                if response is not None:
+                    wait_job(session, response.json()['status_url'], started)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(args.concurrency)]:
+            future.result()
+    return time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=30, help='施压时长（秒）')
+    parser.add_argument('--mix', default='preview=5,search=1,events=4', help='各接口的请求比例')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟搜索引擎的平均响应时间（秒）')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.02, help='搜索引擎返回 5xx 的比例')
+    parser.add_argument('--captcha-rate', type=float, default=0.02, help='搜索引擎返回验证码页的比例')
+    parser.add_argument('--notion-rate', type=float, default=3.0, help='模拟 Notion 每秒允许的请求数')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker 数')
+    parser.add_argument('--threads', type=int, default=16, help='每个 worker 的线程数')
+    parser.add_argument('--cache-ttl', type=float, default=0, help='应用抓取缓存 TTL，默认 0 即每次都请求搜索引擎')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求超时（秒）')
+    parser.add_argument('--poll-interval', type=float, default=0.1, help='轮询发布任务状态的间隔（秒）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    args = parser.parse_args()
+
+    stubs, stub_env = start_stubs(args.latency, args.jitter, args.error_rate, args.captcha_rate, args.notion_rate)
+    with tempfile.TemporaryDirectory(prefix='trending-loadtest-') as workdir:
+        process, base_url = start_app(workdir, stub_env, args)
+        try:
+            recorder = Recorder()
+            elapsed = run_load(base_url, args, recorder)
+            metrics = _session().get(base_url + '/metrics', timeout=5).text if args.json else None
+        finally:
+            stop_app(process)
+            for stub in stubs.values():
+                stub.stop()
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'elapsed_seconds': round(elapsed, 2),
+        'operations': recorder.summary(elapsed),
+        'stubs': {name: stub.stats() for name, stub in stubs.items()},
+    }
+    if args.json:
+        report['metrics'] = metrics
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{args.concurrency} clients for {report['elapsed_seconds']}s, mix {args.mix}")
+    print(f"{'operation':>12} {'requests':>9} {'rps':>8} {'errors':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for op, stats in report['operations'].items():
+        print(f"{op:>12} {stats['requests']:>9} {stats['throughput_rps']:>8} {stats['error_rate']:>8.2%} "
+              f"{stats['p50_ms']:>7.0f}ms {stats['p90_ms']:>7.0f}ms {stats['p99_ms']:>7.0f}ms {stats['max_ms']:>7.0f}ms")
+    for name, stats in report['stubs'].items():
+        print(f"stub {name}: {stats}")
+
+
+if __name__ == '__main__':
+    main()
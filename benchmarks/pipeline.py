@@ -0,0 +1,197 @@
+"""流水线基准：用录制的结果页样本离线测量解析、时间线、渲染、Notion 格式化以及索引和事件列表
+
+用法：python benchmarks/pipeline.py [--sizes 100,10000,100000] [--repeat 5] [--json]
+                                   [--save FILE] [--compare FILE] [--threshold 0.2]
+
+在临时目录和临时数据库中运行，不访问网络，也不会改动项目里的页面和数据。
+--save 把结果保存为基线，--compare 与基线比较，任何一项中位数变慢超过 threshold 时退出码为 1。
+样本见 benchmarks/fixtures.py。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import ENGINES, load_fixture  # noqa: E402
+
+DEFAULT_SIZES = (100, 10000, 100000)
+KEYWORD = '大模型'
+
+
+def measure(func, repeat, budget):
+    """先预热一次，再最多运行 repeat 次；累计超过 budget 秒后提前结束（至少一次）"""
+    func()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat:
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+        if time.perf_counter() - started > budget:
+            break
+    return {
+        'runs': len(samples),
+        'min_ms': round(min(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+    }
+
+
+def load_app(workdir):
+    """在临时目录中导入 app，页面文件和数据库都写到这里"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(workdir)
+    import app
+    app.ensure_db()
+    return app
+
+
+def seed_events(app, total):
+    """把事件表补足到 total 条"""
+    from sqlalchemy import insert
+    from models import db, Event
+
+    with app.app.app_context():
+        existing = Event.query.count()
+        start = datetime(2024, 1, 1)
+        rows = []
+        for i in range(existing, total):
+            rows.append({
+                'keyword': f'事件 {i}',
+                'url': f'/static/events/{i:06d}_event.html',
+                'notion_page_id': None if i % 3 else f'page-{i}',
+                'timestamp': start + timedelta(minutes=i),
+            })
+            if len(rows) >= 5000:
+                db.session.execute(insert(Event), rows)
+                rows = []
+        if rows:
+            db.session.execute(insert(Event), rows)
+        db.session.commit()
+
+
+def run(sizes, repeat, budget):
+    report = {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {},
+    }
+    results = report['results']
+
+    with tempfile.TemporaryDirectory(prefix='trending-bench-') as workdir:
+        app = load_app(workdir)
+        html = {engine: load_fixture(engine) for engine in ENGINES}
+        parsed = {}
+        for engine in ENGINES:
+            parse = getattr(app, f'parse_{engine}_results')
+            parsed[engine] = parse(html[engine])
+            results[f'parse_{engine}_results'] = measure(lambda: parse(html[engine]), repeat, budget)
+        from results import ResultSet
+        result_set = ResultSet(parsed['bing'], parsed['msn'], parsed['baidu'])
+        report['fixture_results'] = {engine: len(items) for engine, items in parsed.items()}
+
+        results['rank_results'] = measure(
+            lambda: app.rank_results(KEYWORD, result_set), repeat, budget)
+        results['extract_timeline_events'] = measure(
+            lambda: app.extract_timeline_events(result_set), repeat, budget)
+        results['render_results_page'] = measure(
+            lambda: app.render_results_page(KEYWORD, result_set), repeat, budget)
+
+        def render_cold():
+            # 清空片段缓存，相当于模板修改后第一次渲染
+            app.fragment_cache.clear()
+            app.render_results_page(KEYWORD, result_set)
+        results['render_results_page_cold'] = measure(render_cold, repeat, budget)
+        results['format_content_for_notion'] = measure(
+            lambda: app.format_content_for_notion(KEYWORD, result_set), repeat, budget)
+
+        client = app.app.test_client()
+        for size in sorted(sizes):
+            seed_events(app, size)
+            with app.app.app_context():
+                # generate_results_page 包含写文件和重建索引，耗时随事件数量增长
+                results[f'generate_results_page@{size}'] = measure(
+                    lambda: app.generate_results_page(KEYWORD, result_set), repeat, budget)
+                results[f'generate_index_page@{size}'] = measure(app.generate_index_page, repeat, budget)
+
+            def list_events():
+                response = client.get('/api/events')
+                assert response.status_code == 200
+            results[f'api_events@{size}'] = measure(list_events, repeat, budget)
+    return report
+
+
+def compare(report, baseline, threshold):
+    """返回变慢超过 threshold 的项目列表"""
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous['median_ms']:
+            continue
+        ratio = current['median_ms'] / previous['median_ms']
+        current['baseline_median_ms'] = previous['median_ms']
+        current['change'] = round(ratio - 1, 3)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='事件数量档位，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=10.0, help='每一项最多运行的秒数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    parser.add_argument('--save', metavar='FILE', help='把结果保存为基线')
+    parser.add_argument('--compare', metavar='FILE', help='与基线比较')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定变慢的比例，默认 0.2')
+    args = parser.parse_args()
+
+    # 参数里的相对路径相对于调用时的目录，运行期间会切换到临时目录
+    save = os.path.abspath(args.save) if args.save else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    report = run(sizes, args.repeat, args.budget)
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+
+    if save:
+        os.makedirs(os.path.dirname(save), exist_ok=True)
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"python {report['python']} on {report['platform']}")
+        print(f"fixture results: {report['fixture_results']}")
+        for name, stats in report['results'].items():
+            line = f"{name:>32}: median {stats['median_ms']:>10.3f}ms  min {stats['min_ms']:>10.3f}ms  ({stats['runs']} runs)"
+            if 'change' in stats:
+                flag = '  REGRESSION' if name in regressions else ''
+                line += f"  {stats['change']:+.1%} vs baseline{flag}"
+            print(line)
+    if regressions:
+        print(f"regressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""共享抓取缓存的检查和基准：跨进程的防击穿锁、TTL、容量淘汰，以及 SQLite / Redis 后端的读取耗时
+
+用法：python benchmarks/shared_cache.py [--processes 8] [--compute-seconds 0.5] [--redis redis://localhost:6379/15]
+
+SQLite 后端在临时目录中运行。Redis 后端使用 --redis 指定的服务；没有指定时使用 fakeredis
+（pip install fakeredis，本地模拟的 Redis），两者都没有时跳过。任何一项检查失败时退出码为 1。
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from result_cache import RedisCacheBackend, ResultCache, SqliteCacheBackend  # noqa: E402
+
+KEY = ('bing', '大模型')
+
+
+def _worker(path, log_path, compute_seconds, queue):
+    cache = ResultCache(ttl=60, backend=SqliteCacheBackend(path))
+
+    def compute():
+        with open(log_path, 'a') as f:
+            f.write(f'{os.getpid()}\n')
+        time.sleep(compute_seconds)
+        return ['result']
+
+    started = time.perf_counter()
+    value = cache.get_or_compute(KEY, compute)
+    queue.put((value, time.perf_counter() - started))
+
+
+def check_stampede(workdir, processes, compute_seconds):
+    """多个进程同时请求同一个 key，只应有一个进程计算"""
+    path = os.path.join(workdir, 'stampede.db')
+    log_path = os.path.join(workdir, 'computes.log')
+    open(log_path, 'w').close()
+    SqliteCacheBackend(path)
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_worker, args=(path, log_path, compute_seconds, queue))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    results = [queue.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+    with open(log_path) as f:
+        computes = len(f.read().split())
+    slowest = max(seconds for _, seconds in results)
+    ok = computes == 1 and all(value == ['result'] for value, _ in results)
+    return ok, f'{processes} processes, {computes} compute(s), slowest {slowest * 1000:.0f}ms'
+
+
+def check_instances(backend, instances, compute_seconds):
+    """多个 ResultCache 实例（各自的进程内去重互不相干）在线程中同时请求，只靠后端的锁保证只计算一次"""
+    computes = []
+
+    def compute():
+        computes.append(1)
+        time.sleep(compute_seconds)
+        return ['result']
+
+    key = ('instances', str(time.time()))
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(
+        ResultCache(ttl=60, backend=backend, poll_interval=0.01).get_or_compute(key, compute)))
+        for _ in range(instances)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ok = len(computes) == 1 and values == [['result']] * instances
+    return ok, f'{instances} instances, {len(computes)} compute(s)'
+
+
+def check_backend(backend):
+    """TTL、锁和跨实例读取"""
+    problems = []
+    backend.set('short', '"v"', 0.05)
+    time.sleep(0.1)
+    if backend.get('short') is not None:
+        problems.append('entry did not expire')
+    if not backend.acquire('lock', 5) or backend.acquire('lock', 5) or not backend.locked('lock'):
+        problems.append('lock is not exclusive')
+    backend.release('lock')
+    if backend.locked('lock'):
+        problems.append('lock was not released')
+
+    writer, reader = ResultCache(ttl=60, backend=backend), ResultCache(ttl=60, backend=backend)
+    writer.set(KEY, ['a'])
+    if reader.get_or_compute(KEY, lambda: ['computed']) != ['a'] or reader.stats()['shared_hits'] != 1:
+        problems.append('second instance did not read the shared entry')
+    reader.get_or_compute(('empty',), lambda: [])
+    if backend.get(ResultCache._shared_key(('empty',))) is not None:
+        problems.append('empty result was cached')
+    return not problems, ', '.join(problems) or 'ttl, lock and shared reads ok'
+
+
+def check_eviction(workdir):
+    backend = SqliteCacheBackend(os.path.join(workdir, 'evict.db'), max_bytes=1000)
+    for i in range(20):
+        backend.set(f'k{i}', 'x' * 100, 60)
+    stats = backend.stats()
+    ok = stats['bytes'] <= 1000 and backend.get('k19') is not None and backend.get('k0') is None
+    return ok, f"{stats['items']} items, {stats['bytes']} bytes after writing 2000"
+
+
+def measure_reads(backend, repeat=200):
+    """新的 ResultCache 实例（本地未命中）从共享后端读取一条结果的耗时"""
+    value = [{'title': f'title {i}', 'link': f'https://example.com/{i}', 'snippet': 'x' * 200} for i in range(10)]
+    ResultCache(ttl=60, backend=backend).set(KEY, value)
+    samples = []
+    for _ in range(repeat):
+        cache = ResultCache(ttl=60, backend=backend)
+        start = time.perf_counter()
+        cache.get(KEY)
+        samples.append(time.perf_counter() - start)
+    return f'shared read p50 {statistics.median(samples) * 1e6:.0f}us'
+
+
+def redis_backend(url):
+    if url:
+        return RedisCacheBackend(url, prefix='trending:cache-check:'), url
+    try:
+        import fakeredis
+    except ImportError:
+        return None, 'skipped (no --redis and fakeredis is not installed)'
+    return RedisCacheBackend('redis://fake', client=fakeredis.FakeRedis()), 'fakeredis'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--compute-seconds', type=float, default=0.5)
+    parser.add_argument('--redis', default=None, help='Redis 地址，不指定时使用 fakeredis')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        sqlite = SqliteCacheBackend(os.path.join(workdir, 'cache.db'))
+        checks = [
+            ('sqlite stampede', lambda: check_stampede(workdir, args.processes, args.compute_seconds)),
+            ('sqlite backend', lambda: check_backend(sqlite)),
+            ('sqlite lock', lambda: check_instances(sqlite, args.processes, args.compute_seconds)),
+            ('sqlite eviction', lambda: check_eviction(workdir)),
+        ]
+        redis, redis_label = redis_backend(args.redis)
+        if redis is not None:
+            checks.append((f'redis backend ({redis_label})', lambda: check_backend(redis)))
+            checks.append((f'redis lock ({redis_label})',
+                           lambda: check_instances(redis, args.processes, args.compute_seconds)))
+        for name, check in checks:
+            ok, detail = check()
+            failed |= not ok
+            print(f"{'ok' if ok else 'FAIL':>4}  {name}: {detail}")
+        if redis is None:
+            print(f'      redis backend: {redis_label}')
+
+        print(f'sqlite {measure_reads(sqlite)}')
+        if redis is not None:
+            print(f'redis ({redis_label}) {measure_reads(redis)}')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
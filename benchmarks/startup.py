@@ -0,0 +1,80 @@
+"""启动耗时基准：冷启动导入 app 以及第一个请求的耗时
+
+用法：python benchmarks/startup.py [--runs 10] [--json]
+
+每次都在新进程里运行，并把代理指向不可达地址，确保启动过程不依赖网络。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+response = client.get('/api/health')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'first_request': first_request - imported,
+    'status': response.status_code,
+    'heavy_modules_loaded': [m for m in ('bs4', 'notion_client', 'httpx') if m in sys.modules],
+}))
+"""
+
+
+def run_once():
+    env = dict(os.environ)
+    # 任何网络访问都会立即失败
+    env.update({'HTTP_PROXY': 'http://127.0.0.1:9', 'HTTPS_PROXY': 'http://127.0.0.1:9',
+                'http_proxy': 'http://127.0.0.1:9', 'https_proxy': 'http://127.0.0.1:9'})
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(values):
+    return {
+        'min_ms': round(min(values) * 1000, 2),
+        'median_ms': round(statistics.median(values) * 1000, 2),
+        'max_ms': round(max(values) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    report = {
+        'runs': args.runs,
+        'import': summarize([s['import'] for s in samples]),
+        'first_request': summarize([s['first_request'] for s in samples]),
+        'health_status': samples[-1]['status'],
+        'heavy_modules_loaded': samples[-1]['heavy_modules_loaded'],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"runs: {report['runs']}")
+    for key in ('import', 'first_request'):
+        stats = report[key]
+        print(f"{key:>14}: min {stats['min_ms']}ms  median {stats['median_ms']}ms  max {stats['max_ms']}ms")
+    print(f"/api/health status: {report['health_status']}")
+    print(f"heavy modules loaded at startup: {report['heavy_modules_loaded'] or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
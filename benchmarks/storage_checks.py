@@ -0,0 +1,166 @@
+"""页面存储的检查和基准：S3 兼容存储的分片上传、批量写入和删除、本地读缓存的重新验证，以及跨节点的缩略图
+
+用法：python benchmarks/storage_checks.py [--endpoint http://127.0.0.1:9000 --bucket pages] [--pages 200]
+
+--endpoint 指向 MinIO 等 S3 兼容服务（凭证使用 AWS 的环境变量，bucket 需要已存在）；不指定时在本进程中
+启动 moto（pip install "moto[server]" boto3，本地模拟的 S3）。都没有安装时退出码为 2，检查失败时为 1。
+所有对象写在随机前缀下，结束后删除。
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from page_storage import CachedPageStorage, S3PageStorage  # noqa: E402
+
+# 1x1 像素的 GIF
+PIXEL = 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+
+
+def start_stand_in():
+    """启动本地的 moto S3 服务，返回 (endpoint, 停止函数)"""
+    from moto.server import ThreadedMotoServer
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    # 不打印每个请求的访问日志
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return f'http://{host}:{port}', server.stop
+
+
+def check_multipart(storage):
+    data = os.urandom(storage.part_size * 2 + 1024)
+    etag = storage.put('big.bin', data)
+    uploads = storage.client.list_multipart_uploads(Bucket=storage.bucket, Prefix=storage.prefix).get('Uploads')
+    ok = storage.get('big.bin') == data and etag.endswith('-3') and not uploads
+    return ok, f'{len(data) // 1024 // 1024}MB in 3 parts, etag {etag}'
+
+
+def check_abort(storage):
+    """complete 失败时应放弃分片，不留下未完成的上传"""
+    original = storage.client.complete_multipart_upload
+
+    def fail(**kwargs):
+        raise RuntimeError('injected failure')
+
+    storage.client.complete_multipart_upload = fail
+    try:
+        storage.put('aborted.bin', os.urandom(storage.part_size + 1))
+        return False, 'put did not raise'
+    except RuntimeError:
+        pass
+    finally:
+        storage.client.complete_multipart_upload = original
+    uploads = storage.client.list_multipart_uploads(Bucket=storage.bucket, Prefix=storage.prefix).get('Uploads')
+    return not uploads and storage.stat('aborted.bin') is None, f'{len(uploads or [])} dangling uploads'
+
+
+def check_batch(storage, pages):
+    items = [(f'batch/{i:05d}.html', f'<p>{i}</p>') for i in range(pages)]
+    started = time.perf_counter()
+    etags = storage.put_many(items)
+    batched = time.perf_counter() - started
+    started = time.perf_counter()
+    for name, data in items[:20]:
+        storage.put(name, data)
+    sequential = (time.perf_counter() - started) / 20 * pages
+    listed = storage.list('batch/')
+    deleted = storage.delete_many(listed)
+    ok = (len(etags) == pages and listed == [name for name, _ in items] and deleted == pages
+          and not storage.list('batch/'))
+    return ok, (f'{pages} pages: put_many {batched * 1000:.0f}ms, '
+                f'sequential ~{sequential * 1000:.0f}ms, delete_many {deleted}')
+
+
+def check_cache(storage, workdir):
+    """两个节点各自的本地缓存：另一个节点覆盖或删除的页面在 ttl 之后可见，未变化时只做 HEAD"""
+    node_a = CachedPageStorage(storage, os.path.join(workdir, 'a'), ttl=0.2)
+    node_b = CachedPageStorage(storage, os.path.join(workdir, 'b'), ttl=0.2)
+    problems = []
+    node_a.put('page.html', 'v1')
+    if node_b.get('page.html') != b'v1' or node_b.get('page.html') != b'v1':
+        problems.append('first read')
+    time.sleep(0.25)
+    node_b.get('page.html')
+    if node_b.stats()['revalidations'] != 1:
+        problems.append('unchanged page was downloaded again')
+    node_a.put('page.html', 'v2')
+    time.sleep(0.25)
+    if node_b.get('page.html') != b'v2':
+        problems.append('overwrite not visible after ttl')
+    node_a.delete('page.html')
+    time.sleep(0.25)
+    if node_b.get('page.html') is not None:
+        problems.append('delete not visible after ttl')
+    return not problems, ', '.join(problems) or f'node b {node_b.stats()}'
+
+
+def check_thumbnails(storage, workdir):
+    """节点 a 渲染页面时登记的缩略图，节点 b 也能返回"""
+    from thumbnails import ThumbnailCache
+    node_a = ThumbnailCache(os.path.join(workdir, 'thumbs-a'), registry=storage)
+    node_b = ThumbnailCache(os.path.join(workdir, 'thumbs-b'), registry=storage)
+    inline = node_a.proxy_url(PIXEL).rsplit('/', 1)[1]
+    remote = node_a.proxy_url('https://example.com/image.jpg').rsplit('/', 1)[1]
+    found = node_b.get(inline)
+    registered = storage.get(node_b._name(remote, '.url'))
+    ok = found is not None and registered == b'https://example.com/image.jpg'
+    return ok, 'data: URI and remote URL registered on node a resolve on node b'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoint', default=None, help='S3 兼容服务地址，不指定时启动 moto')
+    parser.add_argument('--bucket', default='page-storage-check')
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        import boto3
+        if args.endpoint:
+            endpoint, stop = args.endpoint, None
+        else:
+            endpoint, stop = start_stand_in()
+    except ImportError as e:
+        print(f'skipped: {e} (pip install boto3 "moto[server]", or pass --endpoint)', file=sys.stderr)
+        sys.exit(2)
+
+    failed = False
+    try:
+        client = boto3.client('s3', endpoint_url=endpoint)
+        if stop is not None:
+            client.create_bucket(Bucket=args.bucket)
+        # 分片大小用 S3 允许的最小值，检查时不需要上传太大的对象
+        storage = S3PageStorage(args.bucket, prefix=f'check-{uuid.uuid4().hex[:8]}', client=client, part_size=0)
+        print(f'endpoint {endpoint}, bucket {args.bucket}, prefix {storage.prefix}')
+        with tempfile.TemporaryDirectory() as workdir:
+            checks = [
+                ('multipart', lambda: check_multipart(storage)),
+                ('abort', lambda: check_abort(storage)),
+                ('batch', lambda: check_batch(storage, args.pages)),
+                ('read cache', lambda: check_cache(storage, workdir)),
+                ('thumbnails', lambda: check_thumbnails(storage, workdir)),
+            ]
+            for name, check in checks:
+                ok, detail = check()
+                failed |= not ok
+                print(f"{'ok' if ok else 'FAIL':>4}  {name}: {detail}")
+        storage.delete_many(storage.list())
+    finally:
+        if stop is not None:
+            stop()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""本地模拟服务：搜索引擎结果页和 Notion API，用于压测
+
+用法：python benchmarks/stubs.py [--latency 0.2] [--error-rate 0.02] [--captcha-rate 0.02] [--notion-rate 3]
+
+启动后打印需要设置的环境变量（BING_BASE_URL 等），把应用指向这些服务即可。
+压测脚本 benchmarks/loadtest.py 会在进程内直接启动它们。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import ENGINES, load_fixture  # noqa: E402
+
+CAPTCHA_PAGE = ('<!DOCTYPE html><html><head><title>验证</title></head><body>'
+                '<div class="captcha">请输入验证码以继续访问</div><form><input name="code"/></form></body></html>')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        if not isinstance(body, bytes):
+            body = (body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def do_GET(self):
+        self.server.stub.handle(self, 'GET')
+
+    def do_POST(self):
+        self.server.stub.handle(self, 'POST')
+
+    def do_PATCH(self):
+        self.server.stub.handle(self, 'PATCH')
+
+
+class _Stub:
+    """在后台线程中运行的 HTTP 服务，start() 返回服务地址"""
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def delay(self):
+        wait = self.latency + random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def start(self, host='127.0.0.1', port=0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'http://{host}:{self._server.server_address[1]}'
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class EngineStub(_Stub):
+    """任何 GET 请求都返回该搜索引擎的样本页，按比例注入 5xx 错误和验证码页"""
+
+    def __init__(self, engine, latency=0.2, jitter=0.1, error_rate=0.0, captcha_rate=0.0):
+        super().__init__(latency, jitter)
+        self.engine = engine
+        self.page = load_fixture(engine).encode('utf-8')
+        self.error_rate = error_rate
+        self.captcha_rate = captcha_rate
+
+    def handle(self, handler, method):
+        self.count('requests')
+        self.delay()
+        roll = random.random()
+        if roll < self.error_rate:
+            self.count('errors')
+            handler._send(503, 'Service Unavailable', 'text/plain')
+        elif roll < self.error_rate + self.captcha_rate:
+            # 搜索引擎的验证码页通常是 200，页面里没有结果
+            self.count('captchas')
+            handler._send(200, CAPTCHA_PAGE, 'text/html')
+        else:
+            handler._send(200, self.page, 'text/html')
+
+
+class NotionStub(_Stub):
+    """模拟 Notion 的 databases / pages / blocks 接口，超过 rate 时返回 429 和 Retry-After"""
+
+    def __init__(self, rate=3.0, burst=3, latency=0.1, jitter=0.05):
+        super().__init__(latency, jitter)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self.pages = {}
+
+    def _take(self):
+        """令牌桶，返回需要等待的秒数（0 表示放行）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    @staticmethod
+    def _error(handler, status, code, message, headers=None):
+        handler._send(status, {'object': 'error', 'status': status, 'code': code, 'message': message},
+                      headers=headers)
+
+    def handle(self, handler, method):
+        self.count('requests')
+        if not handler.headers.get('Authorization'):
+            return self._error(handler, 401, 'unauthorized', 'API token is invalid.')
+        wait = self._take()
+        if wait:
+            self.count('rate_limited')
+            return self._error(handler, 429, 'rate_limited', 'Rate limited',
+                               headers={'Retry-After': f'{wait:.2f}'})
+        self.delay()
+
+        parts = handler.path.split('?')[0].strip('/').split('/')
+        if method == 'GET' and parts[:2] == ['v1', 'databases'] and len(parts) == 3:
+            handler._send(200, {
+                'object': 'database', 'id': parts[2],
+                'properties': {'Title': {'type': 'title', 'title': {}}, 'URL': {'type': 'url', 'url': {}}},
+            })
+        elif method == 'POST' and parts == ['v1', 'pages']:
+            body = handler._body()
+            page = {'object': 'page', 'id': str(uuid.uuid4()), 'archived': False,
+                    'properties': body.get('properties', {})}
+            with self._lock:
+                self.pages[page['id']] = page
+            self.count('pages_created')
+            handler._send(200, page)
+        elif method == 'GET' and parts[:2] == ['v1', 'pages'] and len(parts) == 3:
+            page = self.pages.get(parts[2])
+            if page is None:
+                return self._error(handler, 404, 'object_not_found', f'Could not find page with ID: {parts[2]}.')
+            handler._send(200, page)
+        elif method == 'PATCH' and parts[:2] == ['v1', 'blocks'] and parts[3:] == ['children']:
+            handler._body()
+            self.count('blocks_appended')
+            handler._send(200, {'object': 'list', 'results': [], 'has_more': False})
+        else:
+            self._error(handler, 400, 'invalid_request_url', 'Invalid request URL.')
+
+
+def start_stubs(latency=0.2, jitter=0.1, error_rate=0.0, captcha_rate=0.0, notion_rate=3.0, notion_burst=3):
+    """启动三个搜索引擎和 Notion 的模拟服务，返回 (stubs, 应用需要的环境变量)"""
+    stubs = {
+        engine: EngineStub(engine, latency, jitter, error_rate, captcha_rate)
+        for engine in ENGINES
+    }
+    stubs['notion'] = NotionStub(notion_rate, notion_burst)
+    env = {f'{name.upper()}_BASE_URL': stub.start() for name, stub in stubs.items()}
+    env.update({'NOTION_TOKEN': 'stub-token', 'NOTION_DATABASE_ID': 'stub-database'})
+    return stubs, env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help='搜索引擎平均响应时间（秒）')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-rate', type=float, default=0.0)
+    parser.add_argument('--notion-rate', type=float, default=3.0, help='Notion 每秒允许的请求数')
+    args = parser.parse_args()
+
+    stubs, env = start_stubs(args.latency, args.jitter, args.error_rate, args.captcha_rate, args.notion_rate)
+    for key, value in env.items():
+        print(f'export {key}={value}')
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps({name: stub.stats() for name, stub in stubs.items()}), file=sys.stderr)
+    except KeyboardInterrupt:
+        for stub in stubs.values():
+            stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""登录页背景：服务端缓存的 Bing 每日图片
+
+每天向 Bing 请求一次当天的图片信息，下载几种尺寸保存到本地（用 Pillow 再压缩一次），
+登录页只访问本站的 /daily-image/<尺寸>.jpg。当天获取失败时继续使用上一次成功获取的图片，
+并在 retry_interval 秒后重试。已有图片时更新在后台线程中进行，不阻塞请求；还没有任何图片时同步获取，
+同时到达的请求等待同一次获取的结果，失败后 cold_retry_interval 秒就可以重试。
+
+目录结构：
+    meta.json              当前图片的标题、版权信息、日期和各尺寸文件
+    <日期>/<尺寸>.jpg       只保留最近两天
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import date
+from io import BytesIO
+
+import requests
+
+log = logging.getLogger(__name__)
+
+# Bing 直接提供这些分辨率，按 urlbase + '_{宽}x{高}.jpg' 下载
+VARIANTS = {
+    'large': (1920, 1080),
+    'medium': (1366, 768),
+    'small': (800, 480),
+}
+
+
+class DailyImage:
+    def __init__(self, directory, base_url='https://www.bing.com', market='zh-CN', retry_interval=1800, timeout=10,
+                 quality=75, cold_retry_interval=60):
+        self.directory = directory
+        self.base_url = base_url.rstrip('/')
+        self.market = market
+        self.retry_interval = retry_interval
+        self.cold_retry_interval = cold_retry_interval
+        self.timeout = timeout
+        self.quality = quality
+        self._meta = None
+        self._next_attempt = 0.0
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, 'meta.json')
+
+    def _load_meta(self):
+        if self._meta is None:
+            try:
+                with open(self._meta_path, encoding='utf-8') as f:
+                    self._meta = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return self._meta
+
+    def current(self):
+        """当前图片的信息，今天还没有获取过时触发更新；从未成功获取过时返回 None"""
+        meta = self._load_meta()
+        if self._stale(meta) and time.monotonic() >= self._next_attempt:
+            # 其它进程可能已经获取过今天的图片
+            self._meta = None
+            meta = self._load_meta()
+        if meta is None:
+            # 还没有任何图片：同步获取，并发的请求在锁上等待这一次获取的结果
+            with self._refresh_lock:
+                if self._load_meta() is None and time.monotonic() >= self._next_attempt:
+                    self._refresh_locked()
+            return self._meta
+        if self._stale(meta) and time.monotonic() >= self._next_attempt:
+            self._next_attempt = time.monotonic() + self.retry_interval
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return self._meta
+
+    @staticmethod
+    def _stale(meta):
+        return meta is None or meta.get('fetched_on') != date.today().isoformat()
+
+    def image_path(self, variant):
+        meta = self.current()
+        if meta is None or variant not in meta.get('variants', {}):
+            return None
+        path = os.path.join(self.directory, meta['variants'][variant])
+        return path if os.path.exists(path) else None
+
+    def refresh(self):
+        """获取当天的图片，成功返回 True；已有线程在更新时直接返回 False"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            return self._refresh_locked()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_locked(self):
+        try:
+            meta = self._fetch()
+            self._meta = meta
+            self._next_attempt = 0.0
+            log.info("Daily image updated: %s", meta.get('title'))
+            return True
+        except Exception as e:
+            # 还没有任何图片时较快重试，否则登录页长时间没有背景
+            retry = self.retry_interval if self._meta is not None else self.cold_retry_interval
+            self._next_attempt = time.monotonic() + retry
+            log.warning("Error fetching daily image, keeping the last one: %s", e)
+            return False
+
+    def _fetch(self):
+        response = requests.get(f'{self.base_url}/HPImageArchive.aspx',
+                                params={'format': 'js', 'idx': 0, 'n': 1, 'mkt': self.market}, timeout=self.timeout)
+        response.raise_for_status()
+        image = response.json()['images'][0]
+        day = image.get('startdate') or date.today().strftime('%Y%m%d')
+
+        day_dir = os.path.join(self.directory, day)
+        os.makedirs(day_dir, exist_ok=True)
+        variants = {}
+        for name, (width, height) in VARIANTS.items():
+            url = f"{self.base_url}{image['urlbase']}_{width}x{height}.jpg"
+            image_response = requests.get(url, timeout=self.timeout)
+            image_response.raise_for_status()
+            data = image_response.content
+            if not data.startswith(b'\xff\xd8\xff'):
+                raise ValueError(f'{url} is not a JPEG image')
+            path = os.path.join(day_dir, f'{name}.jpg')
+            self._write(path, self._compress(data))
+            variants[name] = os.path.join(day, f'{name}.jpg')
+
+        meta = {
+            'title': image.get('title', ''),
+            'copyright': image.get('copyright', ''),
+            'date': day,
+            'fetched_on': date.today().isoformat(),
+            'variants': variants,
+        }
+        self._write(self._meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        self._prune(keep=day)
+        return meta
+
+    def _compress(self, data):
+        try:
+            from PIL import Image
+        except ImportError:
+            return data
+        try:
+            with Image.open(BytesIO(data)) as image:
+                output = BytesIO()
+                image.convert('RGB').save(output, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+            return output.getvalue() if output.tell() < len(data) else data
+        except Exception as e:
+            log.warning("Error compressing daily image: %s", e)
+            return data
+
+    @staticmethod
+    def _write(path, data):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _prune(self, keep):
+        # 保留当前和前一天的目录，正在下载旧图片的请求不会失败
+        days = sorted(name for name in os.listdir(self.directory)
+                      if name.isdigit() and os.path.isdir(os.path.join(self.directory, name)))
+        for day in days[:-2]:
+            if day != keep:
+                shutil.rmtree(os.path.join(self.directory, day), ignore_errors=True)
+
+
+def create_daily_image(default_directory):
+    return DailyImage(
+        directory=os.getenv('DAILY_IMAGE_DIR') or default_directory,
+        base_url=os.getenv('DAILY_IMAGE_BASE_URL', 'https://www.bing.com'),
+        market=os.getenv('DAILY_IMAGE_MARKET', 'zh-CN'),
+    )
@@ -0,0 +1,112 @@
+"""渲染后的单条结果 HTML 片段缓存
+
+key 由模板版本和结果各字段计算得到，内容或模板任一变化都会换成新的 key，旧片段不需要主动失效，
+由 LRU 自然淘汰。内存中最多保留 max_items 个片段；设置了 directory 时，内存未命中会再查磁盘，
+新渲染的片段同时写入磁盘，多个进程和重启之后都可以复用。磁盘目录按模板版本分子目录，
+模板修改后可以直接删除旧版本的目录。
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+def template_version(source):
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+
+
+def fragment_key(result):
+    payload = '\x1f'.join((result.title, result.link, result.snippet, result.image_url, result.time))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class FragmentCache:
+    def __init__(self, max_items=5000, directory=None):
+        self.max_items = max_items
+        self.directory = directory
+        self._items = OrderedDict()  # (模板版本, key) -> html
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, version, key):
+        with self._lock:
+            html = self._items.get((version, key))
+            if html is not None:
+                self._items.move_to_end((version, key))
+                self.hits += 1
+                return html
+        html = self._read(version, key)
+        if html is not None:
+            self._remember(version, key, html)
+            with self._lock:
+                self.disk_hits += 1
+        return html
+
+    def set(self, version, key, html):
+        self._remember(version, key, html)
+        self._write(version, key, html)
+
+    def get_or_render(self, version, key, render):
+        html = self.get(version, key)
+        if html is None:
+            with self._lock:
+                self.misses += 1
+            html = render()
+            self.set(version, key, html)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._items), 'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+
+    def _remember(self, version, key, html):
+        with self._lock:
+            self._items[(version, key)] = html
+            self._items.move_to_end((version, key))
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def _path(self, version, key):
+        return os.path.join(self.directory, version, key[:2], key + '.html')
+
+    def _read(self, version, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(version, key), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning("Error reading fragment %s: %s", key, e)
+            return None
+
+    def _write(self, version, key, html):
+        if not self.directory:
+            return
+        path = self._path(version, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，其它进程不会读到写了一半的片段
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Error writing fragment %s: %s", key, e)
+
+
+def create_fragment_cache():
+    return FragmentCache(
+        max_items=int(os.getenv('FRAGMENT_CACHE_SIZE', '5000')),
+        directory=os.getenv('FRAGMENT_CACHE_DIR') or None,
+    )
@@ -0,0 +1,162 @@
+import json
+
+from models import db, EventSnapshot
+from results import ENGINES, SearchResult
+
+FIELDS = SearchResult.__slots__
+
+# 连续增量超过这个数量时写入一个全量版本，限制重建某个版本需要回放的链长
+MAX_CHAIN = 10
+
+
+def _keyed(results):
+    """按链接给结果编号，同一链接重复出现时加上序号区分"""
+    keyed = {}
+    for result in results:
+        key = result.get('link', '') or '#'
+        base, n = key, 1
+        while key in keyed:
+            n += 1
+            key = f'{base}#{n}'
+        keyed[key] = {field: result.get(field, '') for field in FIELDS}
+    return keyed
+
+
+def make_delta(old_state, new_state):
+    """计算两个版本之间每个搜索引擎的增删改，没有变化的引擎不出现在结果里"""
+    delta = {}
+    for engine in ENGINES:
+        old = _keyed(old_state.get(engine, []))
+        new = _keyed(new_state.get(engine, []))
+        added = [key for key in new if key not in old]
+        removed = [key for key in old if key not in new]
+        changed = {}
+        for key in new:
+            if key in old:
+                fields = {f: new[key][f] for f in FIELDS if new[key][f] != old[key][f]}
+                if fields:
+                    changed[key] = fields
+        entry = {}
+        if added:
+            entry['added'] = {key: new[key] for key in added}
+        if removed:
+            entry['removed'] = removed
+        if changed:
+            entry['changed'] = changed
+        # 只有应用增删后的顺序与新版本不一致时才记录顺序
+        order = list(new)
+        if [key for key in old if key in new] + added != order:
+            entry['order'] = order
+        if entry:
+            delta[engine] = entry
+    return delta
+
+
+def apply_delta(state, delta):
+    new_state = {}
+    for engine in ENGINES:
+        current = _keyed(state.get(engine, []))
+        entry = delta.get(engine)
+        if entry:
+            for key in entry.get('removed', []):
+                current.pop(key, None)
+            for key, fields in entry.get('changed', {}).items():
+                current[key] = dict(current[key], **fields)
+            current.update(entry.get('added', {}))
+            if 'order' in entry:
+                current = {key: current[key] for key in entry['order']}
+        new_state[engine] = list(current.values())
+    return new_state
+
+
+def _state(results):
+    return results.to_dict()
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def list_versions(event_id):
+    return EventSnapshot.query.filter_by(event_id=event_id).order_by(EventSnapshot.version).all()
+
+
+def load_version(event_id, version=None):
+    """重建指定版本（默认最新版本）的搜索结果，版本不存在返回 None"""
+    query = EventSnapshot.query.filter_by(event_id=event_id)
+    if version is not None:
+        query = query.filter(EventSnapshot.version <= version)
+    base = query.filter_by(is_full=True).order_by(EventSnapshot.version.desc()).first()
+    if base is None or (version is not None and not query.filter_by(version=version).first()):
+        return None
+    state = base.load()
+    for snapshot in query.filter(EventSnapshot.version > base.version).order_by(EventSnapshot.version):
+        state = apply_delta(state, snapshot.load())
+    return state
+
+
+def record_snapshot(event_id, results):
+    """保存新版本（results 为 ResultSet），内容没有变化时不写入，返回新版本号或 None"""
+    new_state = _state(results)
+    latest = EventSnapshot.query.filter_by(event_id=event_id).order_by(EventSnapshot.version.desc()).first()
+    if latest is None:
+        db.session.add(EventSnapshot(event_id=event_id, version=1, is_full=True, payload=_dumps(new_state)))
+        return 1
+
+    old_state = load_version(event_id)
+    delta = make_delta(old_state, new_state)
+    if not delta:
+        return None
+
+    last_full = EventSnapshot.query.filter_by(event_id=event_id, is_full=True) \
+        .order_by(EventSnapshot.version.desc()).first()
+    version = latest.version + 1
+    # 增量链过长时改存全量，重建任意版本最多回放 MAX_CHAIN 个增量
+    if version - last_full.version > MAX_CHAIN:
+        db.session.add(EventSnapshot(event_id=event_id, version=version, is_full=True, payload=_dumps(new_state)))
+    else:
+        db.session.add(EventSnapshot(event_id=event_id, version=version, is_full=False, payload=_dumps(delta)))
+    return version
+
+
+def compact(event_id, keep=MAX_CHAIN):
+    """只保留最近 keep 个版本：最早保留的版本改写成全量，更早的版本删除"""
+    versions = list_versions(event_id)
+    if len(versions) <= keep:
+        return 0
+    first_kept = versions[-keep]
+    if not first_kept.is_full:
+        first_kept.payload = _dumps(load_version(event_id, first_kept.version))
+        first_kept.is_full = True
+    removed = 0
+    for snapshot in versions[:-keep]:
+        db.session.delete(snapshot)
+        removed += 1
+    return removed
+
+
+def diff_versions(event_id, from_version, to_version):
+    old_state = load_version(event_id, from_version)
+    new_state = load_version(event_id, to_version)
+    if old_state is None or new_state is None:
+        return None
+    return make_delta(old_state, new_state)
+
+
+def history_results(event_id):
+    """历史上出现过的所有结果（按链接去重，保留最后一次出现的内容），用于时间线"""
+    seen = {}
+    for snapshot in list_versions(event_id):
+        data = snapshot.load()
+        if snapshot.is_full:
+            for engine in ENGINES:
+                for key, item in _keyed(data.get(engine, [])).items():
+                    seen[(engine, key)] = item
+        else:
+            for engine, entry in data.items():
+                for key, item in entry.get('added', {}).items():
+                    seen[(engine, key)] = item
+                for key, fields in entry.get('changed', {}).items():
+                    if (engine, key) in seen:
+                        seen[(engine, key)] = dict(seen[(engine, key)], **fields)
+    return [SearchResult.from_dict(item) for item in seen.values()]
@@ -0,0 +1,303 @@
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """等待执行的任务过多"""
+
+
+class Job:
+    """后台任务，记录每个阶段的进度供轮询或 SSE 推送"""
+
+    def __init__(self, kind, description='', store=None):
+        self.id = uuid.uuid4().hex
+        self._store = store
+        self.kind = kind
+        self.description = description
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self._cond = threading.Condition()
+
+    def _append(self, event, stage, message, data=None, **state):
+        """state 为同时更新的字段（status、result 等），与事件在同一把锁内生效，
+        等待事件的一方不会看到已结束却没有结束事件的中间状态"""
+        with self._cond:
+            for name, value in state.items():
+                setattr(self, name, value)
+            self.events.append({
+                'event': event,
+                'stage': stage,
+                'message': message,
+                'data': data,
+                'elapsed': round(time.time() - self.created_at, 3)
+            })
+            if self._store is not None:
+                # 状态变化都伴随一个事件，在这里一并写入共享存储，其它 worker 进程也能查询
+                try:
+                    self._store.save(self, len(self.events) - 1)
+                except Exception as e:
+                    log.warning("Error saving job %s: %s", self.id, e)
+            self._cond.notify_all()
+
+    def report(self, stage, message, data=None):
+        """记录一个已完成的阶段，例如 report('bing', 'bing done (8 results)')"""
+        self._append('stage', stage, message, data)
+
+    def _start(self):
+        self._append('stage', 'started', 'started', status='running')
+
+    def _finish(self, result):
+        self._append('done', 'done', 'done', result, status='done', result=result, finished_at=time.time())
+
+    def _fail(self, error):
+        error = str(error)
+        self._append('failed', 'failed', error, status='failed', error=error, finished_at=time.time())
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def wait_events(self, since, timeout=15):
+        """返回 since 之后的新事件，没有新事件时最多等待 timeout 秒"""
+        with self._cond:
+            if len(self.events) <= since and not self.finished:
+                self._cond.wait(timeout)
+            return self.events[since:], self.finished
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'description': self.description,
+                'status': self.status,
+                'result': self.result,
+                'error': self.error,
+                'stages': list(self.events),
+            }
+
+
+class SqliteJobStore:
+    """任务状态和进度保存在 SQLite 中，同一台机器上的任一 worker 进程都可以查询"""
+
+    def __init__(self, path, max_history=500):
+        self.path = path
+        self.max_history = max_history
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, kind TEXT, description TEXT, status TEXT, result TEXT, error TEXT, '
+                'created_at REAL, finished_at REAL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS job_events ('
+                'job_id TEXT, seq INTEGER, payload TEXT, PRIMARY KEY (job_id, seq))'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    @staticmethod
+    def _save_job(conn, job):
+        conn.execute('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+            job.id, job.kind, job.description, job.status,
+            json.dumps(job.result, ensure_ascii=False, default=str), job.error, job.created_at, job.finished_at
+        ))
+
+    def create(self, job):
+        with self._connect() as conn:
+            self._save_job(conn, job)
+
+    def save(self, job, seq):
+        """写入 job 的当前状态和第 seq 个事件，调用方持有 job 的锁"""
+        with self._connect() as conn:
+            self._save_job(conn, job)
+            conn.execute('INSERT OR REPLACE INTO job_events VALUES (?, ?, ?)',
+                         (job.id, seq, json.dumps(job.events[seq], ensure_ascii=False, default=str)))
+
+    def load(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT id, kind, description, status, result, error FROM jobs WHERE id = ?',
+                               (job_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('id', 'kind', 'description', 'status', 'result', 'error'), row),
+                    result=json.loads(row[4]) if row[4] else None)
+
+    def events(self, job_id, since=0):
+        """返回 (since 之后的事件, 任务是否已结束)；先读状态再读事件，已结束时事件一定完整"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            rows = conn.execute('SELECT payload FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq',
+                                (job_id, since)).fetchall()
+        finished = row is None or row[0] in ('done', 'failed')
+        return [json.loads(payload) for payload, in rows], finished
+
+    def trim(self):
+        # 只淘汰已结束的旧任务
+        with self._connect() as conn:
+            old = [job_id for job_id, in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                (self.max_history,)
+            )]
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in old])
+            conn.executemany('DELETE FROM job_events WHERE job_id = ?', [(job_id,) for job_id in old])
+
+
+class StoredJob:
+    """在其它 worker 进程中执行的任务，只读，状态从共享存储中读取"""
+
+    def __init__(self, store, job_id, poll_interval=0.5):
+        self.id = job_id
+        self._store = store
+        self.poll_interval = poll_interval
+
+    def wait_events(self, since, timeout=15):
+        deadline = time.monotonic() + timeout
+        while True:
+            events, finished = self._store.events(self.id, since)
+            if events or finished or time.monotonic() >= deadline:
+                return events, finished
+            time.sleep(self.poll_interval)
+
+    def to_dict(self):
+        job = self._store.load(self.id) or {'id': self.id, 'status': 'failed', 'error': 'job not found'}
+        job['stages'], _ = self._store.events(self.id)
+        return job
+
+
+def create_job_store(url=None):
+    """根据配置创建任务的共享存储：memory（默认，任务只能在执行它的进程中查询）或 sqlite:///path/to/jobs.db"""
+    url = url or os.getenv('JOB_STORE', 'memory')
+    if url.startswith('sqlite:///'):
+        return SqliteJobStore(url[len('sqlite:///'):], max_history=int(os.getenv('JOB_MAX_HISTORY', '500')))
+    return None
+
+
+class PrefixedReporter:
+    """给进度消息加上前缀，批量任务中区分不同关键词"""
+
+    def __init__(self, job, prefix):
+        self.job = job
+        self.prefix = prefix
+
+    def report(self, stage, message, data=None):
+        self.job.report(stage, f'{self.prefix}: {message}', data)
+
+
+class JobManagerClosed(JobQueueFull):
+    """正在关闭，不再接收新任务"""
+
+
+class JobManager:
+    """在有界线程池中执行任务，保留最近的任务记录"""
+
+    def __init__(self, max_workers=4, max_pending=100, max_history=500, store=None):
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._futures = set()
+        self._jobs = OrderedDict()
+        self._lock = threading.Condition()
+        self._pending = 0
+        self._closed = False
+
+    def submit(self, kind, func, *args, description='', **kwargs):
+        """提交任务，func 的第一个参数是 Job，用来汇报进度"""
+        job = Job(kind, description, store=self.store)
+        with self._lock:
+            if self._closed:
+                raise JobManagerClosed('shutting down, not accepting new jobs')
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f'too many pending jobs ({self._pending})')
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._trim()
+        if self.store is not None:
+            try:
+                self.store.create(job)
+                self.store.trim()
+            except Exception as e:
+                log.warning("Error saving job %s: %s", job.id, e)
+        # 任务在提交方的上下文中执行，日志沿用发起请求的请求 id
+        future = self._executor.submit(contextvars.copy_context().run, self._run, job, func, args, kwargs)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard_future)
+        return job
+
+    def _discard_future(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _run(self, job, func, args, kwargs):
+        job._start()
+        try:
+            job._finish(func(job, *args, **kwargs))
+        except Exception as e:
+            log.exception("Job %s (%s) failed: %s", job.id, job.kind, e)
+            job._fail(e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._lock.notify_all()
+
+    def _trim(self):
+        # 只淘汰已结束的旧任务
+        while len(self._jobs) > self.max_history:
+            for job_id, job in self._jobs.items():
+                if job.finished:
+                    del self._jobs[job_id]
+                    break
+            else:
+                break
+
+    def get(self, job_id):
+        """本进程中的任务直接返回；配置了共享存储时也能返回其它 worker 进程中的任务"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            try:
+                if self.store.load(job_id) is not None:
+                    return StoredJob(self.store, job_id)
+            except Exception as e:
+                log.warning("Error loading job %s: %s", job_id, e)
+        return job
+
+    def shutdown(self, timeout=30):
+        """停止接收新任务并等待已提交的任务完成，超时返回 False"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._closed = True
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            finished = not self._pending
+            futures = list(self._futures)
+        # 取消还没开始的任务（cancel_futures 需要 Python 3.9）
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        return finished
+
+    def pending(self):
+        with self._lock:
+            return self._pending
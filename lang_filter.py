@@ -0,0 +1,110 @@
+"""按文字比例过滤搜索结果
+
+每条结果的标题和摘要按 Unicode 区块分成假名（kana）、汉字（han）、拉丁字母（latin）和谚文（hangul），
+比例以这四类字符的总数为分母，数字、标点和空白不计入。一批结果拼接后只做一次 str.translate
+（查预先生成的区块表），再逐条计数，每条结果的开销固定，与每个搜索引擎返回多少条无关。
+
+过滤规则写成 "kana<=0,hangul<=0.3" 这样的字符串：
+    LANG_POLICY           所有搜索引擎的默认规则，未设置时为 kana<=0（丢弃含假名的结果）
+    LANG_POLICY_<ENGINE>  覆盖单个搜索引擎的规则，如 LANG_POLICY_BAIDU=""（空字符串表示不过滤）
+"""
+import os
+import re
+
+SCRIPTS = ('kana', 'han', 'latin', 'hangul')
+
+_BLOCKS = {
+    'kana': ((0x3040, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)),
+    'han': ((0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)),
+    'latin': ((0x41, 0x5A), (0x61, 0x7A), (0xC0, 0x24F), (0xFF21, 0xFF3A), (0xFF41, 0xFF5A)),
+    'hangul': ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)),
+}
+# 每种文字对应的标记字符；其它字符映射为 '.'，分隔符映射为换行
+_MARKS = {'kana': 'k', 'han': 'h', 'latin': 'l', 'hangul': 'g'}
+_SEPARATOR = '\x00'
+
+
+def _build_table():
+    # 以码位为下标的查找表（基本多文种平面），超出范围的字符 translate 时保持原样，
+    # 不会是标记字符，因此不影响计数
+    table = ['.'] * 0x10000
+    for script, ranges in _BLOCKS.items():
+        for start, end in ranges:
+            table[start:end + 1] = _MARKS[script] * (end - start + 1)
+    table[ord(_SEPARATOR)] = '\n'
+    return ''.join(table)
+
+
+_TABLE = _build_table()
+
+
+def score(texts):
+    """返回每段文字中各文字所占的比例，[{'kana': 0.0, 'han': 0.8, ...}, ...]"""
+    if not texts:
+        return []
+    marked = _SEPARATOR.join(text.replace(_SEPARATOR, ' ') for text in texts).translate(_TABLE)
+    scores = []
+    for line in marked.split('\n'):
+        counts = [line.count(_MARKS[script]) for script in SCRIPTS]
+        total = sum(counts)
+        scores.append({script: count / total if total else 0.0 for script, count in zip(SCRIPTS, counts)})
+    return scores
+
+
+_RULE = re.compile(r'^\s*(kana|han|latin|hangul)\s*(<=|>=)\s*([0-9.]+)\s*$')
+
+
+class LanguagePolicy:
+    """一组规则 (文字, '<=' 或 '>=', 比例)，全部满足的结果才保留"""
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    @classmethod
+    def parse(cls, spec):
+        rules = []
+        for part in (spec or '').split(','):
+            if not part.strip():
+                continue
+            match = _RULE.match(part)
+            if not match:
+                raise ValueError(f'invalid language rule: {part!r}')
+            script, op, threshold = match.groups()
+            rules.append((script, op, float(threshold)))
+        return cls(rules)
+
+    def violation(self, ratios):
+        """返回第一条不满足的规则，全部满足时返回 None"""
+        for script, op, threshold in self.rules:
+            ratio = ratios[script]
+            if op == '<=' and ratio > threshold:
+                return f'{script}={ratio:.2f} > {threshold:g}'
+            if op == '>=' and ratio < threshold:
+                return f'{script}={ratio:.2f} < {threshold:g}'
+        return None
+
+    def apply(self, results):
+        """返回 (保留的结果, [(被丢弃的结果, 原因)])"""
+        if not self.rules or not results:
+            return list(results), []
+        kept, dropped = [], []
+        for result, ratios in zip(results, score([f'{r.title} {r.snippet}' for r in results])):
+            reason = self.violation(ratios)
+            if reason:
+                dropped.append((result, reason))
+            else:
+                kept.append(result)
+        return kept, dropped
+
+    def __repr__(self):
+        return 'LanguagePolicy(%r)' % ','.join(f'{s}{op}{t:g}' for s, op, t in self.rules)
+
+
+DEFAULT_POLICY = 'kana<=0'
+
+
+def policy_for(engine):
+    spec = os.getenv(f'LANG_POLICY_{engine.upper()}')
+    if spec is None:
+        spec = os.getenv('LANG_POLICY', DEFAULT_POLICY)
+    return LanguagePolicy.parse(spec)
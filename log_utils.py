@@ -0,0 +1,117 @@
+"""统一的日志配置：分级、按模块命名的 logger、请求 id、逐条日志采样和非阻塞输出
+
+各模块使用 logging.getLogger(__name__)，逐条结果这类高频日志使用 item_logger(__name__)。
+日志参数用 % 占位符传入（log.debug('parsed %s', title)），级别未开启时不会格式化字符串。
+
+可通过环境变量调整：
+    LOG_LEVEL          日志级别，默认 INFO
+    LOG_FORMAT         text 或 json，默认 text
+    LOG_SAMPLE_RATE    逐条日志的采样比例（0~1），默认 0.01
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+# 当前请求（或后台任务）的 id，由 Flask before_request 设置，提交后台任务时随上下文传递
+request_id = contextvars.ContextVar('request_id', default='-')
+
+_listener = None
+_handler = None
+
+# LogRecord 自带的属性，其余属性视为 extra 传入的结构化字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """只保留 rate 比例的记录，WARNING 及以上总是保留"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def item_logger(name):
+    """逐条结果日志使用的 logger，按 LOG_SAMPLE_RATE 采样"""
+    logger = logging.getLogger(f'{name}.items')
+    if not any(isinstance(f, SampleFilter) for f in logger.filters):
+        logger.addFilter(SampleFilter(float(os.getenv('LOG_SAMPLE_RATE', '0.01'))))
+    return logger
+
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(_handler.queue, *_handler.targets, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_in_child():
+    # fork 时队列里尚未写出的记录属于父进程，子进程换一个新队列
+    _handler.queue = queue.SimpleQueue()
+    _start_listener()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """给根 logger 挂一个 QueueHandler，实际写出由后台线程完成，调用方不会阻塞在 IO 上
+
+    重复调用只会调整级别。
+    """
+    global _handler
+    root = logging.getLogger()
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    if _handler is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if (fmt or os.getenv('LOG_FORMAT', 'text')) == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s'))
+
+    _handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _handler.targets = (output,)
+    # 在入队前补上请求 id，写出线程里已经拿不到调用方的上下文
+    _handler.addFilter(RequestIdFilter())
+    root.addHandler(_handler)
+    _start_listener()
+    atexit.register(_stop_listener)
+    # gunicorn preload 时在 master 中完成配置，fork 出的 worker 没有写出线程，需要重新启动
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_in_child)
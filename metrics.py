@@ -0,0 +1,164 @@
+"""轻量级指标：各阶段耗时直方图、结果数量和错误计数，以 Prometheus 文本格式导出
+
+每个进程各自统计；多 worker 部署时每次抓取的是处理该请求的 worker 的数据。
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [每个桶的计数..., 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels, ("le", _format_value(float(bound))))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(labels, ("le", "+Inf"))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(float(series[-2]))}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self, prefix='trending'):
+        self.prefix = prefix
+        self._metrics = []
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        metric = Histogram(f'{self.prefix}_{name}', help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        metric = Counter(f'{self.prefix}_{name}', help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+STAGE_LATENCY = registry.histogram('stage_duration_seconds', 'Latency of each pipeline stage')
+STAGE_ERRORS = registry.counter('stage_errors_total', 'Pipeline stages that raised or reported a failure')
+ENGINE_RESULTS = registry.histogram('engine_results', 'Number of results returned per engine fetch', COUNT_BUCKETS)
+FILTERED_RESULTS = registry.counter('filtered_results_total', 'Results dropped by the language filter')
+
+# 当前请求的入口（search / preview / add_to_notion），作为所有阶段指标的 route 标签
+_route = contextvars.ContextVar('metrics_route', default='')
+
+
+@contextmanager
+def route(name):
+    token = _route.set(name)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def _labels(stage, labels):
+    return (('route', _route.get()), ('stage', stage)) + tuple(sorted(labels.items()))
+
+
+@contextmanager
+def timer(stage, **labels):
+    """记录一个阶段的耗时，阶段内抛出异常时同时增加错误计数"""
+    key = _labels(stage, labels)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(labels=key)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, key)
+
+
+def record_error(stage, **labels):
+    STAGE_ERRORS.inc(labels=_labels(stage, labels))
+
+
+def record_results(engine, count):
+    ENGINE_RESULTS.observe(count, (('route', _route.get()), ('engine', engine)))
+
+
+def record_filtered(engine, count):
+    FILTERED_RESULTS.inc(count, (('route', _route.get()), ('engine', engine)))
+
+
+def instrument(name):
+    """视图装饰器：把整个请求记为 name 路由的 total 阶段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with route(name), timer('total'):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
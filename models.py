@@ -1,5 +1,7 @@
+import json
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from results import ResultSet
 
 db = SQLAlchemy()
 
@@ -19,6 +21,62 @@ class Event(db.Model):
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+class EventResult(db.Model):
+    """发布时抓取到的搜索结果，补发 Notion 时直接复用，无需重新抓取"""
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), unique=True, nullable=False)
+    results = db.Column(db.Text, nullable=False)
+
+    @classmethod
+    def from_results(cls, event_id, results):
+        return cls(event_id=event_id, results=json.dumps(results.to_dict(), ensure_ascii=False))
+
+    def load(self):
+        return ResultSet.from_dict(json.loads(self.results))
+
+class TrackedEvent(db.Model):
+    """需要定时刷新的事件"""
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), unique=True, nullable=False)
+    interval = db.Column(db.Integer, nullable=False, default=3600)  # 刷新间隔（秒）
+    content_hash = db.Column(db.String(64))
+    last_checked = db.Column(db.DateTime)
+    last_changed = db.Column(db.DateTime)
+    next_check = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        def fmt(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+        return {
+            'event_id': self.event_id,
+            'interval': self.interval,
+            'last_checked': fmt(self.last_checked),
+            'last_changed': fmt(self.last_changed),
+            'next_check': fmt(self.next_check)
+        }
+
+class EventSnapshot(db.Model):
+    """事件搜索结果的历史版本：第一个版本保存全量，之后只保存增量"""
+    __table_args__ = (db.UniqueConstraint('event_id', 'version'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False)
+    is_full = db.Column(db.Boolean, nullable=False, default=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def load(self):
+        return json.loads(self.payload)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'is_full': self.is_full,
+            'size': len(self.payload),
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
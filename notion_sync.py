@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+log = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """补发进度记录，中断后重新运行可以从上次的位置继续"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.created = {}   # event_id -> 已创建的 notion page id
+        self.verified = {}  # notion page id -> 确认存在的时间
+        self.failed = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.created = {int(k): v for k, v in data.get('created', {}).items()}
+            # 旧格式是 event id 列表，没有时间，全部重新校验
+            verified = data.get('verified', {})
+            self.verified = verified if isinstance(verified, dict) else {}
+            self.failed = {int(k): v for k, v in data.get('failed', {}).items()}
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': self.created,
+                'verified': self.verified,
+                'failed': self.failed
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def mark_created(self, event_id, page_id):
+        with self._lock:
+            self.created[event_id] = page_id
+            self.failed.pop(event_id, None)
+            self._save()
+
+    def mark_verified(self, page_id):
+        with self._lock:
+            self.verified[page_id] = time.time()
+            self._save()
+
+    def is_verified(self, page_id, max_age):
+        verified_at = self.verified.get(page_id)
+        return verified_at is not None and time.time() - verified_at < max_age
+
+    def discard(self, event_id, page_id):
+        """页面已失效：不再复用为该事件记录的页面，也不再视为已校验"""
+        with self._lock:
+            self.created.pop(event_id, None)
+            self.verified.pop(page_id, None)
+            self._save()
+
+    def mark_failed(self, event_id, error):
+        with self._lock:
+            self.failed[event_id] = str(error)
+            self._save()
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def verify_pages(manager, pages, checkpoint, workers=4, max_age=3600):
+    """并发检查已有 page id 是否仍存在，返回失效页面对应的 event id 列表
+
+    max_age 秒内确认过的页面跳过；失效页面从 checkpoint 中移除，之后不会被当作已创建的页面恢复。
+    """
+    missing = []
+    pending = [(event_id, page_id) for event_id, page_id in pages
+               if not checkpoint.is_verified(page_id, max_age)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(manager.page_exists, page_id): (event_id, page_id)
+            for event_id, page_id in pending
+        }
+        for future in as_completed(futures):
+            event_id, page_id = futures[future]
+            try:
+                if future.result():
+                    checkpoint.mark_verified(page_id)
+                else:
+                    checkpoint.discard(event_id, page_id)
+                    missing.append(event_id)
+            except Exception as e:
+                log.warning("校验 Notion 页面失败 (event %s): %s", event_id, e)
+    return missing
+
+
+def publish_pages(manager, jobs, checkpoint, on_created, workers=4):
+    """并发创建 Notion 页面
+
+    jobs 为 (event_id, title, blocks, url) 列表，所有请求共用 manager 的限流器。
+    每成功一个页面立即写入 checkpoint，然后在调用线程里执行 on_created(event_id, page_id)。
+    """
+    report = {'created': 0, 'resumed': 0, 'failed': 0}
+
+    # 上次已经创建但没来得及写回数据库的页面，直接复用
+    remaining = []
+    for job in jobs:
+        event_id = job[0]
+        if event_id in checkpoint.created:
+            on_created(event_id, checkpoint.created[event_id])
+            report['resumed'] += 1
+        else:
+            remaining.append(job)
+
+    def publish(job):
+        event_id, title, blocks, url = job
+        page_id = manager.create_page(title=title, content=blocks, url=url)
+        if not page_id:
+            raise RuntimeError('无法创建页面')
+        checkpoint.mark_created(event_id, page_id)
+        return page_id
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(publish, job): job[0] for job in remaining}
+        for future in as_completed(futures):
+            event_id = futures[future]
+            try:
+                on_created(event_id, future.result())
+                report['created'] += 1
+            except Exception as e:
+                checkpoint.mark_failed(event_id, e)
+                report['failed'] += 1
+                log.warning("补发 Notion 页面失败 (event %s): %s", event_id, e)
+    return report
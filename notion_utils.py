@@ -1,33 +1,269 @@
-from notion_client import Client
+import logging
 import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """令牌桶限流器，所有 Notion 请求都经过它排队调度"""
+
+    def __init__(self, rate=3.0, capacity=3):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        # 收到 429 后在 Retry-After 之前暂停发放令牌
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+        # 统计信息
+        self._waiting = 0
+        self._max_waiting = 0
+        self._acquired = 0
+        self._throttled = 0
+        self._wait_seconds = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        start = time.monotonic()
+        with self._cond:
+            self._waiting += 1
+            self._max_waiting = max(self._max_waiting, self._waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        self._cond.wait(self._blocked_until - now)
+                        continue
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    self._cond.wait((1 - self._tokens) / self.rate)
+            finally:
+                self._waiting -= 1
+            self._acquired += 1
+            self._wait_seconds += time.monotonic() - start
+
+    def penalize(self, seconds):
+        """服务端返回 429 时，按 Retry-After 暂停所有请求"""
+        with self._cond:
+            self._throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': self._waiting,
+                'max_queue_depth': self._max_waiting,
+                'requests': self._acquired,
+                'throttled': self._throttled,
+                'total_wait_seconds': round(self._wait_seconds, 3),
+                'blocked_for_seconds': round(max(0.0, self._blocked_until - time.monotonic()), 3),
+            }
+
+
+# Notion API 限制：单个 rich_text 最多 2000 字符，单次请求最多 100 个子块
+MAX_TEXT_LENGTH = 2000
+MAX_CHILDREN_PER_REQUEST = 100
+
+
+def _rich_text(content, link=None):
+    """把任意长度文本切成不超过 2000 字符的 rich_text 片段"""
+    content = str(content) if content else ''
+    if link and (not link.startswith(('http://', 'https://')) or len(link) > MAX_TEXT_LENGTH):
+        link = None
+    pieces = []
+    for start in range(0, len(content), MAX_TEXT_LENGTH):
+        text = {"content": content[start:start + MAX_TEXT_LENGTH]}
+        if link:
+            text["link"] = {"url": link}
+        pieces.append({"type": "text", "text": text})
+    return pieces
+
+
+def _block(block_type, rich_text):
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {"rich_text": rich_text}
+    }
+
+
+def heading_block(text, level=2):
+    return _block(f"heading_{level}", _rich_text(text))
+
+
+def paragraph_blocks(text):
+    """长文本按 2000 字符拆分成多个段落块"""
+    for piece in _rich_text(text):
+        yield _block("paragraph", [piece])
+
+
+def result_blocks(result):
+    """单条搜索结果（SearchResult）：带链接的标题 + 摘要列表项"""
+    title = result.title or result.link
+    if title:
+        yield _block("heading_3", _rich_text(title, result.link))
+    details = ' · '.join(part for part in (result.snippet, result.time) if part)
+    if details:
+        yield _block("bulleted_list_item", _rich_text(details))
+
+
+def build_result_blocks(sections):
+    """按来源逐条生成 Notion 块，sections 为 [(来源名称, 结果列表), ...]"""
+    for name, results in sections:
+        if not results:
+            continue
+        yield heading_block(name)
+        for result in results:
+            yield from result_blocks(result)
+
+
+def _retry_after_seconds(error, default=1.0):
+    """从 429 响应头中读取 Retry-After（秒）"""
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return max(float(headers.get('Retry-After', default)), 0.0)
+    except (TypeError, ValueError):
+        return default
+
 
 class NotionManager:
-    def __init__(self, token, database_id):
-        self.notion = Client(auth=token)
+    def __init__(self, token, database_id, rate_limiter=None, schema_ttl=None, max_retries=3, base_url=None):
+        # notion_client 依赖 httpx，导入较慢，用到时才加载
+        from notion_client import Client
+        # NOTION_BASE_URL 可以指向本地的模拟服务，用于压测
+        base_url = base_url or os.getenv('NOTION_BASE_URL')
+        self.notion = Client(auth=token, base_url=base_url) if base_url else Client(auth=token)
         self.database_id = database_id
-        # 验证连接
+        self.scheduler = rate_limiter or RateLimiter(
+            rate=float(os.getenv('NOTION_RATE_LIMIT', '3')),
+            capacity=int(os.getenv('NOTION_BURST', '3'))
+        )
+        self.max_retries = max_retries
+
+        # 数据库校验结果缓存，避免每次建页面前都调用 databases.retrieve
+        self.schema_ttl = schema_ttl if schema_ttl is not None else float(os.getenv('NOTION_SCHEMA_TTL', '600'))
+        self._database = None
+        self._database_checked_at = 0.0
+        self._schema_lock = threading.Lock()
+        self._schema_hits = 0
+        self._schema_misses = 0
+        self.last_error = None
+
+        # 不在构造时访问网络，首次建页面时才校验数据库
+
+    def _call(self, func, *args, **kwargs):
+        """通过限流器发起 Notion 请求，遇到 429 按 Retry-After 重试"""
+        from notion_client import APIResponseError
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            try:
+                return func(*args, **kwargs)
+            except APIResponseError as e:
+                if e.status != 429 or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                retry_after = _retry_after_seconds(e)
+                log.warning("Notion rate limited, retrying in %ss (attempt %d)", retry_after, attempt)
+                self.scheduler.penalize(retry_after)
+
+    def ensure_database(self, force=False):
+        """校验数据库访问权限，结果在 schema_ttl 秒内复用"""
+        with self._schema_lock:
+            fresh = time.monotonic() - self._database_checked_at < self.schema_ttl
+            if self._database is not None and fresh and not force:
+                self._schema_hits += 1
+                return self._database
+            self._schema_misses += 1
+            try:
+                self._database = self._call(self.notion.databases.retrieve, self.database_id)
+                self._database_checked_at = time.monotonic()
+                self.last_error = None
+            except Exception as e:
+                self.invalidate_database()
+                self.last_error = str(e)
+                raise
+            return self._database
+
+    def invalidate_database(self):
+        self._database = None
+        self._database_checked_at = 0.0
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        stats.update({
+            'schema_cache_hits': self._schema_hits,
+            'schema_cache_misses': self._schema_misses,
+            'schema_cached': self._database is not None,
+            'last_error': self.last_error,
+        })
+        return stats
+
+    def page_exists(self, page_id):
+        """检查页面是否仍然存在（被删除或归档都视为不存在）"""
+        from notion_client import APIResponseError
         try:
-            self.notion.databases.retrieve(self.database_id)
-            print("Successfully connected to Notion database")
-        except Exception as e:
-            print(f"Failed to connect to Notion database: {str(e)}")
+            page = self._call(self.notion.pages.retrieve, page_id)
+        except APIResponseError as e:
+            if e.status in (400, 404):
+                return False
             raise
+        return not page.get('archived', False)
+
+    def append_blocks(self, block_id, blocks, retries=0):
+        """按每批 100 个块追加子块；服务端错误或网络错误时从失败的批次开始最多重试 retries 次"""
+        for start in range(0, len(blocks), MAX_CHILDREN_PER_REQUEST):
+            attempt = 0
+            while True:
+                try:
+                    self._call(
+                        self.notion.blocks.children.append,
+                        block_id=block_id,
+                        children=blocks[start:start + MAX_CHILDREN_PER_REQUEST]
+                    )
+                    break
+                except Exception as e:
+                    status = getattr(e, 'status', None)
+                    if attempt >= retries or (status is not None and status < 500):
+                        raise
+                    attempt += 1
+                    log.warning("Error appending blocks to %s, retrying (attempt %d): %s", block_id, attempt, e)
+                    time.sleep(min(2 ** attempt, 10))
+
+    def archive_page(self, page_id):
+        self._call(self.notion.pages.update, page_id, archived=True)
 
     def create_page(self, title, content, url):
+        """创建页面，content 可以是纯文本或块列表；超过 100 个块的部分分批追加"""
         try:
-            # 确保标题和内容是字符串
+            # 确保标题是字符串，内容转换成块列表
             title = str(title) if title else ''
-            content = str(content) if content else ''
-            
-            # 打印调试信息
-            print(f"Creating Notion page with title: {title}")
-            print(f"URL: {url}")
-            
-            # 首先验证数据库访问权限
-            self.notion.databases.retrieve(self.database_id)
-            
+            if isinstance(content, (list, tuple)):
+                blocks = list(content)
+            else:
+                blocks = list(paragraph_blocks(content))
+
+            log.debug("Creating Notion page %r (%d blocks) for %s", title, len(blocks), url)
+
+            # 验证数据库访问权限（带缓存）
+            self.ensure_database()
+
             # 创建页面
-            page = self.notion.pages.create(
+            page = self._call(
+                self.notion.pages.create,
                 parent={"database_id": self.database_id},
                 properties={
                     "Title": {
@@ -43,29 +279,27 @@ class NotionManager:
                         "url": url
                     }
                 },
-                children=[
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {
-                                        "content": content
-                                    }
-                                }
-                            ]
-                        }
-                    }
-                ]
+                children=blocks[:MAX_CHILDREN_PER_REQUEST]
             )
-            print(f"Successfully created Notion page with ID: {page.id}")
-            return page.id
+            log.info("Created Notion page %s for %r", page['id'], title)
+            try:
+                self.append_blocks(page['id'], blocks[MAX_CHILDREN_PER_REQUEST:], retries=self.max_retries)
+            except Exception:
+                # 页面已经创建但内容不完整，归档后返回 None，之后重新发布不会留下重复的半成品页面
+                try:
+                    self.archive_page(page['id'])
+                    log.warning("Archived incomplete Notion page %s for %r", page['id'], title)
+                except Exception as e:
+                    log.error("Error archiving incomplete Notion page %s: %s", page['id'], e)
+                raise
+            return page['id']
         except Exception as e:
-            print(f"Detailed Notion API error: {str(e)}")
-            if hasattr(e, 'body'):
-                print(f"Error body: {e.body}")
+            log.error("Notion API error: %s", e, extra={
+                'notion_status': getattr(e, 'status', None),
+                'notion_body': getattr(e, 'body', None),
+            })
             if hasattr(e, 'status'):
-                print(f"Error status: {e.status}")
-            return None 
\ No newline at end of file
+                # 数据库被删除或取消共享时，让下一次请求重新校验
+                if e.status in (403, 404):
+                    self.invalidate_database()
+            return None
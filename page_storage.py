@@ -0,0 +1,364 @@
+"""渲染后页面的存储
+
+事件页面、GitHub Pages 目录中的页面和索引页面都通过这里读写，不直接访问本地目录：
+    LocalPageStorage  本地目录（默认，即原来的 static/events 和 docs）
+    S3PageStorage     S3 兼容的对象存储（AWS S3、MinIO 等），需要安装 boto3；多个节点共用同一个 bucket
+
+put_many 批量写入，S3 上并发上传，超过 part_size 的对象分片上传；delete_many 批量删除。
+CachedPageStorage 可以包在 S3 存储外面：读取时先查本地磁盘缓存，条目超过 ttl 秒后用 ETag
+向后端确认是否有变化，其它节点覆盖或删除的页面最多 ttl 秒后生效。
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import safe_join
+
+log = logging.getLogger(__name__)
+
+
+def _content_type(name):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return content_type + '; charset=utf-8' if content_type.startswith('text/') else content_type
+
+
+def _to_bytes(data):
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+
+class LocalPageStorage:
+    """保存在本地目录中，ETag 由修改时间和大小组成"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        path = safe_join(self.directory, name)
+        if path is None:
+            raise ValueError(f'invalid page name: {name}')
+        return path
+
+    @staticmethod
+    def _etag(stat):
+        return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+    def put(self, name, data):
+        """写入页面，返回 ETag"""
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，读取方不会看到写了一半的页面
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_to_bytes(data))
+        os.replace(tmp_path, path)
+        return self._etag(os.stat(path))
+
+    def put_many(self, items):
+        """items 为 [(name, data)]，返回 {name: ETag}"""
+        return {name: self.put(name, data) for name, data in items}
+
+    def fetch(self, name):
+        """返回 (内容, ETag)，不存在时返回 None"""
+        try:
+            with open(self._path(name), 'rb') as f:
+                return f.read(), self._etag(os.fstat(f.fileno()))
+        except FileNotFoundError:
+            return None
+
+    def get(self, name):
+        found = self.fetch(name)
+        return found[0] if found else None
+
+    def stat(self, name):
+        """返回 ETag，不存在时返回 None"""
+        try:
+            return self._etag(os.stat(self._path(name)))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_many(self, names):
+        return sum(self.delete(name) for name in names)
+
+    def list(self, prefix=''):
+        names = []
+        for root, _, filenames in os.walk(self.directory):
+            relative = os.path.relpath(root, self.directory)
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                name = filename if relative == '.' else posixpath.join(relative.replace(os.sep, '/'), filename)
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+
+class S3PageStorage:
+    """保存在 S3 兼容存储的 bucket/prefix/ 下，endpoint_url 指向 MinIO 等兼容服务"""
+
+    # S3 要求除最后一片外每片至少 5MB，批量删除每次最多 1000 个
+    MIN_PART_SIZE = 5 * 1024 * 1024
+    DELETE_BATCH = 1000
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, client=None, part_size=8 * 1024 * 1024, max_workers=8):
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.max_workers = max_workers
+
+    def _key(self, name):
+        if not name or name.startswith('/') or '..' in name.split('/'):
+            raise ValueError(f'invalid page name: {name}')
+        return self.prefix + name
+
+    @staticmethod
+    def _error_code(error):
+        return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+    def put(self, name, data):
+        data = _to_bytes(data)
+        if len(data) > self.part_size:
+            return self._put_multipart(name, data)
+        response = self.client.put_object(Bucket=self.bucket, Key=self._key(name), Body=data,
+                                          ContentType=_content_type(name))
+        return response['ETag'].strip('"')
+
+    def _put_multipart(self, name, data):
+        key = self._key(name)
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key,
+                                                        ContentType=_content_type(name))['UploadId']
+
+        def upload(number):
+            start = (number - 1) * self.part_size
+            response = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                                               Body=data[start:start + self.part_size])
+            return {'PartNumber': number, 'ETag': response['ETag']}
+
+        count = (len(data) + self.part_size - 1) // self.part_size
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, count)) as executor:
+                parts = list(executor.map(upload, range(1, count + 1)))
+            response = self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                             MultipartUpload={'Parts': parts})
+        except Exception:
+            # 放弃未完成的分片，否则会一直占用存储空间
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            except Exception as e:
+                log.warning("Error aborting multipart upload of %s: %s", key, e)
+            raise
+        return response['ETag'].strip('"')
+
+    def put_many(self, items):
+        items = list(items)
+        if len(items) <= 1:
+            return {name: self.put(name, data) for name, data in items}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            etags = executor.map(lambda item: self.put(*item), items)
+            return dict(zip((name for name, _ in items), etags))
+
+    def fetch(self, name):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as e:
+            if self._error_code(e) in ('NoSuchKey', '404', 'NotFound'):
+                return None
+            raise
+        return response['Body'].read(), response['ETag'].strip('"')
+
+    def get(self, name):
+        found = self.fetch(name)
+        return found[0] if found else None
+
+    def stat(self, name):
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as e:
+            if self._error_code(e) in ('NoSuchKey', '404', 'NotFound'):
+                return None
+            raise
+        return response['ETag'].strip('"')
+
+    def delete(self, name):
+        return self.delete_many([name]) > 0
+
+    def delete_many(self, names):
+        keys = [self._key(name) for name in names]
+        deleted = 0
+        for start in range(0, len(keys), self.DELETE_BATCH):
+            batch = keys[start:start + self.DELETE_BATCH]
+            response = self.client.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': key} for key in batch],
+                'Quiet': True,
+            })
+            errors = response.get('Errors', [])
+            for error in errors:
+                log.warning("Error deleting %s: %s", error.get('Key'), error.get('Message'))
+            deleted += len(batch) - len(errors)
+        return deleted
+
+    def list(self, prefix=''):
+        names = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            names.extend(item['Key'][len(self.prefix):] for item in page.get('Contents', []))
+        return sorted(names)
+
+
+class CachedPageStorage:
+    """在本地磁盘上缓存另一个存储中的页面，写入和删除同时更新缓存"""
+
+    def __init__(self, backend, directory, ttl=60, max_items=5000):
+        self.backend = backend
+        self.directory = directory
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries = OrderedDict()  # name -> (确认时间, ETag)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def _path(self, name):
+        # 用名称的哈希作为缓存文件名，不受名称中的特殊字符影响
+        key = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, name, data, etag):
+        path = self._path(name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(_to_bytes(data))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Error caching page %s: %s", name, e)
+            return
+        with self._lock:
+            self._entries[name] = (time.monotonic(), etag)
+            self._entries.move_to_end(name)
+            evicted = []
+            while len(self._entries) > self.max_items:
+                evicted.append(self._entries.popitem(last=False)[0])
+        for old in evicted:
+            self._forget_file(old)
+
+    def _forget_file(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def _forget(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+        self._forget_file(name)
+
+    def _read(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, name, data):
+        etag = self.backend.put(name, data)
+        self._remember(name, data, etag)
+        return etag
+
+    def put_many(self, items):
+        items = list(items)
+        etags = self.backend.put_many(items)
+        for name, data in items:
+            self._remember(name, data, etags[name])
+        return etags
+
+    def fetch(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None:
+            checked, etag = entry
+            fresh = time.monotonic() - checked < self.ttl
+            # 过期的条目先确认后端的 ETag 没有变化，不重新下载
+            if fresh or self.backend.stat(name) == etag:
+                data = self._read(name)
+                if data is not None:
+                    with self._lock:
+                        if fresh:
+                            self.hits += 1
+                        else:
+                            self._entries[name] = (time.monotonic(), etag)
+                            self.revalidations += 1
+                    return data, etag
+        with self._lock:
+            self.misses += 1
+        found = self.backend.fetch(name)
+        if found is None:
+            self._forget(name)
+            return None
+        self._remember(name, *found)
+        return found
+
+    def get(self, name):
+        found = self.fetch(name)
+        return found[0] if found else None
+
+    def stat(self, name):
+        return self.backend.stat(name)
+
+    def delete(self, name):
+        self._forget(name)
+        return self.backend.delete(name)
+
+    def delete_many(self, names):
+        names = list(names)
+        for name in names:
+            self._forget(name)
+        return self.backend.delete_many(names)
+
+    def list(self, prefix=''):
+        return self.backend.list(prefix)
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._entries), 'hits': self.hits, 'revalidations': self.revalidations,
+                    'misses': self.misses}
+
+
+def create_page_storage(name, default_directory, url=None):
+    """name 为页面类别（events / docs / thumbnails）。PAGE_STORAGE_URL 为 s3://bucket/前缀 时保存在 <前缀>/<name>/ 下，
+    否则保存在本地的 default_directory；PAGE_CACHE_DIR 设置时在本地缓存从 S3 读取的页面"""
+    url = url or os.getenv('PAGE_STORAGE_URL', '')
+    if not url.startswith('s3://'):
+        return LocalPageStorage(default_directory)
+    bucket, _, prefix = url[len('s3://'):].partition('/')
+    storage = S3PageStorage(
+        bucket,
+        prefix=posixpath.join(prefix, name),
+        endpoint_url=os.getenv('PAGE_STORAGE_ENDPOINT') or None,
+        part_size=int(float(os.getenv('PAGE_STORAGE_PART_MB', '8')) * 1024 * 1024),
+        max_workers=int(os.getenv('PAGE_STORAGE_WORKERS', '8')),
+    )
+    cache_directory = os.getenv('PAGE_CACHE_DIR')
+    if cache_directory:
+        storage = CachedPageStorage(storage, os.path.join(cache_directory, name),
+                                    ttl=float(os.getenv('PAGE_CACHE_TTL', '60')))
+    return storage
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryPreviewStore:
+    """进程内预览存储，按 TTL 过期，超过容量时淘汰最久未访问的预览"""
+
+    def __init__(self, max_items=200, ttl=1800):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()  # preview_id -> (过期时间, keyword, html)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        expired = [pid for pid, (expires, _, _) in self._items.items() if expires <= now]
+        for pid in expired:
+            del self._items[pid]
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def put(self, preview_id, keyword, html):
+        with self._lock:
+            now = time.monotonic()
+            self._items[preview_id] = (now + self.ttl, keyword, html)
+            self._items.move_to_end(preview_id)
+            self._evict(now)
+
+    def get(self, preview_id):
+        """返回 (keyword, html)，不存在或已过期返回 None"""
+        with self._lock:
+            item = self._items.get(preview_id)
+            if item is None:
+                return None
+            expires, keyword, html = item
+            if expires <= time.monotonic():
+                del self._items[preview_id]
+                return None
+            self._items.move_to_end(preview_id)
+            return keyword, html
+
+    def delete(self, preview_id):
+        with self._lock:
+            return self._items.pop(preview_id, None) is not None
+
+    def __len__(self):
+        with self._lock:
+            self._evict(time.monotonic())
+            return len(self._items)
+
+
+class SqlitePreviewStore:
+    """基于 SQLite 的预览存储，同一台机器上的多个 worker 进程共享"""
+
+    def __init__(self, path, max_items=200, ttl=1800):
+        self.path = path
+        self.max_items = max_items
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS previews ('
+                'id TEXT PRIMARY KEY, keyword TEXT, html TEXT, expires REAL, accessed REAL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM previews WHERE expires <= ?', (now,))
+        conn.execute(
+            'DELETE FROM previews WHERE id NOT IN '
+            '(SELECT id FROM previews ORDER BY accessed DESC LIMIT ?)',
+            (self.max_items,)
+        )
+
+    def put(self, preview_id, keyword, html):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO previews VALUES (?, ?, ?, ?, ?)',
+                (preview_id, keyword, html, now + self.ttl, now)
+            )
+            self._evict(conn, now)
+
+    def get(self, preview_id):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT keyword, html FROM previews WHERE id = ? AND expires > ?',
+                (preview_id, now)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE previews SET accessed = ? WHERE id = ?', (now, preview_id))
+            return row
+
+    def delete(self, preview_id):
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM previews WHERE id = ?', (preview_id,)).rowcount > 0
+
+    def __len__(self):
+        with self._connect() as conn:
+            self._evict(conn, time.time())
+            return conn.execute('SELECT COUNT(*) FROM previews').fetchone()[0]
+
+
+def create_preview_store(url=None):
+    """根据配置创建预览存储：memory（默认）或 sqlite:///path/to/previews.db"""
+    url = url or os.getenv('PREVIEW_STORE', 'memory')
+    max_items = int(os.getenv('PREVIEW_MAX_ITEMS', '200'))
+    ttl = float(os.getenv('PREVIEW_TTL', '1800'))
+    if url.startswith('sqlite:///'):
+        return SqlitePreviewStore(url[len('sqlite:///'):], max_items=max_items, ttl=ttl)
+    return MemoryPreviewStore(max_items=max_items, ttl=ttl)
@@ -0,0 +1,171 @@
+"""按需对单个请求做 CPU（cProfile）和内存（tracemalloc）分析，默认关闭
+
+触发方式：
+    请求头 X-Profile-Token 与 PROFILE_TOKEN 一致时分析该请求
+    PROFILE_SAMPLE_RATE（0~1）按比例抽样分析
+
+结果保存在 PROFILES_DIR（默认 profiles/），每次分析生成三个文件：
+    <id>.prof   pstats 文件，可用 python -m pstats 或 snakeviz 查看
+    <id>.txt    耗时最多的函数和分配内存最多的代码位置
+    <id>.json   路由、关键词、耗时等信息
+最多保留 PROFILE_MAX_FILES 次结果。tracemalloc 是全进程的，同一时间只分析一个请求，
+其它请求即使命中也直接跳过。
+"""
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'X-Profile-Token'
+
+
+class Profiler:
+    def __init__(self, directory='profiles', token=None, sample_rate=0.0, max_profiles=50, top=30):
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        self.top = top
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.token) or self.sample_rate > 0
+
+    def authorized(self, headers):
+        supplied = headers.get(TOKEN_HEADER)
+        return bool(self.token and supplied) and hmac.compare_digest(supplied, self.token)
+
+    def trigger(self, route, headers):
+        """决定是否分析这个请求，返回分析 id 或 None"""
+        if not self.enabled:
+            return None
+        if self.authorized(headers):
+            reason = 'header'
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = 'sample'
+        else:
+            return None
+        return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{route}-{reason}-{uuid.uuid4().hex[:8]}"
+
+    @contextmanager
+    def session(self, profile_id, **meta):
+        """profile_id 为 None 或已有分析在进行时不做任何事"""
+        if profile_id is None or not self._lock.acquire(blocking=False):
+            if profile_id is not None:
+                log.info("Skipping profile %s: another profile is running", profile_id)
+            yield
+            return
+        started_tracing = False
+        try:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.clear_traces()
+            # clear_traces() 和重新 start() 都会重置峰值；reset_peak() 在 3.9 才有
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            profile = cProfile.Profile()
+        except Exception:
+            log.exception("Failed to start profile %s", profile_id)
+            if started_tracing and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._lock.release()
+            yield
+            return
+        start = time.perf_counter()
+        error = None
+        profile.enable()
+        try:
+            yield
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            try:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                self._save(profile_id, profile, snapshot, dict(
+                    meta, id=profile_id, seconds=round(elapsed, 4), peak_traced_bytes=peak,
+                    error=error, created=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            except Exception:
+                log.exception("Failed to save profile %s", profile_id)
+            finally:
+                self._lock.release()
+
+    def _save(self, profile_id, profile, snapshot, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        profile.dump_stats(base + '.prof')
+
+        report = io.StringIO()
+        report.write(f"# {profile_id}: {meta['seconds']}s, peak traced memory {meta['peak_traced_bytes']} bytes\n\n")
+        report.write('## Top functions by cumulative time\n')
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+        report.write('\n## Top allocation sites\n')
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            report.write(f'{stat}\n')
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        log.info("Saved profile %s (%.3fs)", profile_id, meta['seconds'])
+        self._prune()
+
+    def list(self):
+        """已保存的分析结果，最新的在前"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta['files'] = [f"{meta['id']}{ext}" for ext in ('.prof', '.txt', '.json')]
+            profiles.append(meta)
+        return profiles
+
+    def _prune(self):
+        ids = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+        for profile_id in ids[:-self.max_profiles] if self.max_profiles else []:
+            for ext in ('.prof', '.txt', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+
+def create_profiler():
+    return Profiler(
+        directory=os.getenv('PROFILES_DIR', 'profiles'),
+        token=os.getenv('PROFILE_TOKEN') or None,
+        sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0')),
+        max_profiles=int(os.getenv('PROFILE_MAX_FILES', '50')),
+    )
@@ -0,0 +1,129 @@
+"""把各搜索引擎的结果合并成一个按得分排序的列表
+
+得分由三部分加权组成：
+    relevance  标题和摘要与关键词的 BM25 相关度（除以本次最高分归一化），标题权重加倍
+    recency    结果日期的新近程度，按 half_life_days 指数衰减，没有日期时为 0
+    agreement  其它搜索引擎中有相似结果（标题词重合度达到阈值或链接相同）的比例
+
+分词：英文和数字按单词切分，连续的汉字切成相邻两字的词（单个汉字保留为一个词），不需要词典。
+打分在整个结果集上用 NumPy 数组批量计算；没有安装 NumPy 时保持各搜索引擎原有的顺序。
+"""
+import logging
+import math
+import re
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+_numpy_warned = False
+
+RankedResult = namedtuple('RankedResult', 'engine result score')
+
+DEFAULT_WEIGHTS = {'relevance': 0.6, 'recency': 0.25, 'agreement': 0.15}
+
+_TOKEN = re.compile('[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+def tokenize(text):
+    tokens = []
+    for run in _TOKEN.findall(text.lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def parse_weights(spec):
+    """'relevance=0.6,recency=0.25,agreement=0.15'，未列出的使用默认值"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (spec or '').split(','):
+        name, sep, value = part.partition('=')
+        if not sep:
+            continue
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f'unknown ranking weight: {name}')
+        weights[name] = float(value)
+    return weights
+
+
+def bm25(np, query_tokens, documents, k1=1.5, b=0.75):
+    """每个文档（词列表）对查询的 BM25 得分"""
+    terms = {term: i for i, term in enumerate(dict.fromkeys(query_tokens))}
+    tf = np.zeros((len(documents), max(len(terms), 1)))
+    lengths = np.empty(len(documents))
+    for row, tokens in enumerate(documents):
+        lengths[row] = len(tokens)
+        for token in tokens:
+            column = terms.get(token)
+            if column is not None:
+                tf[row, column] += 1
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    average = lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * lengths / average)
+    return (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def agreement(np, titles, links, engines, threshold=0.5):
+    """每条结果在其它搜索引擎中有相似结果的比例"""
+    vocabulary = {}
+    rows, columns = [], []
+    for row, tokens in enumerate(titles):
+        for token in set(tokens):
+            rows.append(row)
+            columns.append(vocabulary.setdefault(token, len(vocabulary)))
+    matrix = np.zeros((len(titles), max(len(vocabulary), 1)))
+    matrix[rows, columns] = 1
+    overlap = matrix @ matrix.T
+    sizes = matrix.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - overlap
+    similar = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0) >= threshold
+    link_array = np.array(links, dtype=object)
+    similar |= (link_array[:, None] == link_array[None, :]) & (link_array[:, None] != '')
+
+    names = sorted(set(engines))
+    engine_ids = np.array([names.index(engine) for engine in engines])
+    one_hot = np.eye(len(names))[engine_ids]
+    # 每条结果在各搜索引擎中是否有相似结果，去掉自身所在的引擎
+    matched = (similar.astype(float) @ one_hot) > 0
+    matched[np.arange(len(engines)), engine_ids] = False
+    return matched.sum(axis=1) / max(len(names) - 1, 1)
+
+
+def rank(keyword, groups, date_of, now, top_n=None, weights=None, half_life_days=3.0):
+    """groups 为 [(搜索引擎, 结果列表)]，date_of(result) 返回 datetime 或 None；返回 RankedResult 列表"""
+    global _numpy_warned
+    flat = [(engine, result) for engine, items in groups for result in items]
+    if not flat:
+        return []
+    try:
+        import numpy as np
+    except ImportError:
+        if not _numpy_warned:
+            log.warning("NumPy is not installed, keeping results in engine order")
+            _numpy_warned = True
+        return [RankedResult(engine, result, 0.0) for engine, result in flat][:top_n or None]
+
+    weights = weights or DEFAULT_WEIGHTS
+    titles = [tokenize(result.title) for _, result in flat]
+    documents = [title * 2 + tokenize(result.snippet) for title, (_, result) in zip(titles, flat)]
+
+    relevance = bm25(np, tokenize(keyword), documents)
+    if relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    ages = np.array([
+        (now - date).total_seconds() / 86400 if date else math.nan
+        for date in (date_of(result) for _, result in flat)
+    ])
+    recency = np.nan_to_num(np.exp(-math.log(2) * np.clip(ages, 0, None) / half_life_days), nan=0.0)
+
+    agreeing = agreement(np, titles, [result.link for _, result in flat], [engine for engine, _ in flat])
+
+    scores = (weights['relevance'] * relevance + weights['recency'] * recency
+              + weights['agreement'] * agreeing)
+    # 稳定排序，得分相同的结果保持原来的引擎顺序
+    order = np.argsort(-scores, kind='stable')[:top_n or None]
+    return [RankedResult(flat[i][0], flat[i][1], float(scores[i])) for i in order]
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def results_hash(results):
+    """对归一化后的搜索结果（ResultSet）计算内容哈希
+
+    只比较标题、链接、摘要和时间，并按链接排序，搜索引擎返回顺序的抖动不算作变化。
+    """
+    def normalize(items):
+        return sorted(
+            [' '.join(str(value or '').split()) for value in (item.link, item.title, item.snippet, item.time)]
+            for item in items
+        )
+
+    payload = json.dumps(
+        [normalize(items) for _, items in results.groups()],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RefreshScheduler:
+    """定时检查到期的事件并刷新
+
+    due 返回到期的事件 id 列表，refresh(event_id) 执行一次刷新。
+    每个刷新任务开始前随机等待 0~jitter 秒，并发数不超过 concurrency，避免集中请求上游。
+    """
+
+    def __init__(self, due, refresh, concurrency=2, jitter=30, poll_interval=60):
+        self.due = due
+        self.refresh = refresh
+        self.jitter = jitter
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='refresh')
+        self._inflight = set()
+        self._futures = set()
+        self._lock = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run_one(self, event_id, jitter):
+        try:
+            if jitter and self._stop.wait(random.uniform(0, jitter)):
+                return
+            self.refresh(event_id)
+        except Exception as e:
+            log.exception("刷新事件 %s 失败: %s", event_id, e)
+        finally:
+            with self._lock:
+                self._inflight.discard(event_id)
+                self._lock.notify_all()
+
+    def poll(self, jitter=None):
+        """提交所有到期且没有在刷新中的事件，返回提交的数量"""
+        jitter = self.jitter if jitter is None else jitter
+        submitted = 0
+        for event_id in self.due():
+            with self._lock:
+                if event_id in self._inflight:
+                    continue
+                self._inflight.add(event_id)
+            future = self._executor.submit(self._run_one, event_id, jitter)
+            with self._lock:
+                self._futures.add(future)
+            future.add_done_callback(self._discard_future)
+            submitted += 1
+        return submitted
+
+    def _discard_future(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def run_once(self):
+        """刷新当前到期的事件并等待全部完成，不做随机等待；返回刷新的数量"""
+        submitted = self.poll(jitter=0)
+        with self._lock:
+            while self._inflight:
+                self._lock.wait()
+        return submitted
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.exception("检查待刷新事件失败: %s", e)
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        # 取消还没开始的刷新（cancel_futures 需要 Python 3.9）
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=wait)
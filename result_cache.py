@@ -0,0 +1,305 @@
+"""抓取结果缓存
+
+ResultCache 是进程内的 LRU，可以再接一个共享后端（同一台机器上的多个 worker 共用）：
+    SqliteCacheBackend  sqlite:///path/to/cache.db，按 TTL 过期，总大小超过 max_bytes 时淘汰最久未访问的条目
+    RedisCacheBackend   redis://host:port/db，需要安装 redis；大小由 Redis 的 maxmemory 策略控制
+
+进程内未命中时先查共享后端；都未命中时只有一个线程计算，跨进程时用后端的锁保证同一个 key
+在锁的有效期内只有一个进程在计算，其它进程轮询等待它写入的结果。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class SqliteCacheBackend:
+    """基于 SQLite 的共享缓存，值为字符串"""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT, size INTEGER, expires REAL, accessed REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_locks (key TEXT PRIMARY KEY, expires REAL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        """返回 (value, 剩余秒数)，不存在或已过期返回 None"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, expires FROM cache WHERE key = ? AND expires > ?', (key, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+            return row[0], row[1] - now
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                         (key, value, len(value.encode('utf-8')), now + ttl, now))
+            self._evict(conn, now)
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 从最久未访问的开始删除，直到总大小回到上限以内
+        removed = 0
+        for key, size in conn.execute('SELECT key, size FROM cache ORDER BY accessed').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            total -= size
+            removed += 1
+        log.debug("Evicted %d shared cache entries", removed)
+
+    def acquire(self, key, timeout):
+        """获取 key 的计算锁，timeout 秒后自动失效，防止持有锁的进程退出后一直等待"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_locks WHERE key = ? AND expires <= ?', (key, now))
+            return conn.execute('INSERT OR IGNORE INTO cache_locks VALUES (?, ?)',
+                                (key, now + timeout)).rowcount == 1
+
+    def release(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_locks WHERE key = ?', (key,))
+
+    def locked(self, key):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM cache_locks WHERE key = ? AND expires > ?',
+                                (key, time.time())).fetchone() is not None
+
+    def stats(self):
+        with self._connect() as conn:
+            items, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+        return {'items': items, 'bytes': size}
+
+
+class RedisCacheBackend:
+    """基于 Redis（或兼容服务）的共享缓存，多台机器也可以共用"""
+
+    def __init__(self, url, prefix='trending:cache:', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        pipe = self.client.pipeline()
+        pipe.get(self.prefix + key)
+        pipe.pttl(self.prefix + key)
+        value, ttl_ms = pipe.execute()
+        if value is None:
+            return None
+        return value.decode('utf-8'), max(ttl_ms, 0) / 1000
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value.encode('utf-8'), px=max(int(ttl * 1000), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def acquire(self, key, timeout):
+        return bool(self.client.set(self.prefix + 'lock:' + key, b'1', nx=True, px=max(int(timeout * 1000), 1)))
+
+    def release(self, key):
+        self.client.delete(self.prefix + 'lock:' + key)
+
+    def locked(self, key):
+        return bool(self.client.exists(self.prefix + 'lock:' + key))
+
+    def stats(self):
+        return {}
+
+
+class ResultCache:
+    """带 TTL 的进程内结果缓存，同一个 key 的并发请求只计算一次
+
+    backend 为共享后端时，值通过 dumps / loads 与字符串互相转换。
+    lock_timeout 为跨进程计算锁的有效期，应略长于一次计算的最长耗时。
+    """
+
+    def __init__(self, ttl=300, max_items=1000, backend=None, dumps=json.dumps, loads=json.loads,
+                 lock_timeout=30, poll_interval=0.05):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.backend = backend
+        self.dumps = dumps
+        self.loads = loads
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._items = OrderedDict()  # key -> (过期时间, value)
+        self._inflight = {}          # key -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _shared_key(key):
+        return json.dumps(key, ensure_ascii=False)
+
+    def _get_local(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def _get_shared(self, key):
+        if self.backend is None:
+            return None
+        try:
+            found = self.backend.get(self._shared_key(key))
+            if found is None:
+                return None
+            data, remaining = found
+            value = self.loads(data)
+        except Exception as e:
+            log.warning("Error reading shared cache: %s", e)
+            return None
+        # 进程内副本与共享条目同时过期
+        self._set_local(key, value, min(remaining, self.ttl))
+        with self._lock:
+            self.shared_hits += 1
+        return value
+
+    def get(self, key):
+        value = self._get_local(key)
+        if value is None:
+            value = self._get_shared(key)
+        return value
+
+    def set(self, key, value):
+        self._set_local(key, value, self.ttl)
+        if self.backend is not None and self.ttl > 0:
+            try:
+                self.backend.set(self._shared_key(key), self.dumps(value), self.ttl)
+            except Exception as e:
+                log.warning("Error writing shared cache: %s", e)
+
+    def _compute_and_store(self, key, compute):
+        value = compute()
+        # 空结果多半是抓取失败，不缓存
+        if value:
+            self.set(key, value)
+        return value
+
+    def _compute_shared(self, key, compute):
+        """跨进程只让一个进程计算，其它进程等待它写入共享后端；等待超过 lock_timeout 后自己计算"""
+        if self.backend is None:
+            return self._compute_and_store(key, compute)
+        shared_key = self._shared_key(key)
+        try:
+            owner = self.backend.acquire(shared_key, self.lock_timeout)
+        except Exception as e:
+            log.warning("Error locking shared cache: %s", e)
+            return self._compute_and_store(key, compute)
+        if owner:
+            try:
+                # 先写入结果再释放锁，等待的进程看到锁释放时结果已经可读
+                return self._compute_and_store(key, compute)
+            finally:
+                try:
+                    self.backend.release(shared_key)
+                except Exception as e:
+                    log.warning("Error unlocking shared cache: %s", e)
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self._get_shared(key)
+            if value is not None:
+                return value
+            try:
+                if not self.backend.locked(shared_key):
+                    # 计算的进程出错或结果为空（不缓存），自己计算
+                    break
+            except Exception:
+                break
+        return self._compute_and_store(key, compute)
+
+    def get_or_compute(self, key, compute):
+        """命中则直接返回，否则只让一个线程执行 compute，其它线程等待并共享结果"""
+        while True:
+            value = self.get(key)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return value
+            with self._lock:
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    inflight = self._inflight[key] = {'done': threading.Event()}
+                    owner = True
+                    self.misses += 1
+                else:
+                    owner = False
+            if not owner:
+                inflight['done'].wait()
+                if 'value' in inflight:
+                    return inflight['value']
+                # 计算线程出错，重新尝试
+                continue
+            try:
+                value = self._compute_shared(key, compute)
+                inflight['value'] = value
+                return value
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                inflight['done'].set()
+
+    def stats(self):
+        with self._lock:
+            stats = {'items': len(self._items), 'hits': self.hits, 'shared_hits': self.shared_hits,
+                     'misses': self.misses}
+        if self.backend is not None:
+            try:
+                stats['shared'] = self.backend.stats()
+            except Exception as e:
+                stats['shared'] = {'error': str(e)}
+        return stats
+
+
+def create_cache_backend(url=None):
+    """根据配置创建共享后端：memory（默认，不共享）、sqlite:///path/to/cache.db 或 redis://host:port/db"""
+    url = url or os.getenv('FETCH_CACHE_URL', 'memory')
+    if url.startswith('sqlite:///'):
+        max_bytes = int(float(os.getenv('FETCH_CACHE_MAX_MB', '64')) * 1024 * 1024)
+        return SqliteCacheBackend(url[len('sqlite:///'):], max_bytes=max_bytes)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCacheBackend(url)
+    return None
@@ -0,0 +1,261 @@
+"""流式解析搜索结果页
+
+响应体按块读取（有总字节上限），边读边交给增量 HTML 解析器，每解析完一条结果就产出一条，
+拿到所需数量后立即停止下载。每个搜索引擎用一个 EngineSpec 描述结果容器和各字段的选择器，
+选择器只支持 tag、.class 和 [attr*="value"] 的组合，足够描述各结果页的结构。
+"""
+import codecs
+import logging
+import re
+import time
+from html.parser import HTMLParser
+
+from results import SearchResult
+
+log = logging.getLogger(__name__)
+
+# 没有结束标签的元素，不入栈
+VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                       'param', 'source', 'track', 'wbr'))
+# 这些元素里的文字不计入字段内容
+SKIP_TEXT_TAGS = frozenset(('script', 'style'))
+
+_SELECTOR = re.compile(r'^([a-zA-Z0-9]*)((?:\.[\w-]+)*)(?:\[([\w-]+)\*="([^"]*)"\])?$')
+
+
+class Selector:
+    __slots__ = ('tag', 'classes', 'attr', 'contains')
+
+    def __init__(self, selector):
+        match = _SELECTOR.match(selector)
+        if not match:
+            raise ValueError(f'unsupported selector: {selector}')
+        tag, classes, self.attr, self.contains = match.groups()
+        self.tag = tag or None
+        self.classes = frozenset(c for c in classes.split('.') if c)
+
+    def matches(self, tag, attrs):
+        if self.tag and tag != self.tag:
+            return False
+        if self.classes and not self.classes.issubset((attrs.get('class') or '').split()):
+            return False
+        if self.attr and self.contains not in (attrs.get(self.attr) or ''):
+            return False
+        return True
+
+
+class Field:
+    """结果中的一个字段
+
+    selectors 按优先级排列，取优先级最高且最先出现的元素。
+    attr 为空时取元素文字（strip 为 True 时去掉每段文字两端的空白后拼接），否则取该属性。
+    """
+
+    def __init__(self, selectors, attr=None, strip=True):
+        self.selectors = [Selector(s) for s in selectors]
+        self.attr = attr
+        self.strip = strip
+
+
+class EngineSpec:
+    """containers 按优先级排列；文档中先出现的那种容器被选中后，其它容器不再匹配
+
+    fixup 逐条修正结果，返回 None 表示丢弃；batch_filter 接收每次解析出的一批结果，返回保留的部分。
+    """
+
+    def __init__(self, containers, fields, required=('title', 'link'), fixup=None, batch_filter=None):
+        self.containers = [Selector(s) for s in containers]
+        self.fields = fields
+        self.required = required
+        self.fixup = fixup
+        self.batch_filter = batch_filter
+
+
+class _Capture:
+    __slots__ = ('field', 'rank', 'depth', 'parts', 'strip')
+
+    def __init__(self, field, rank, depth, strip):
+        self.field = field
+        self.rank = rank
+        self.depth = depth
+        self.parts = []
+        self.strip = strip
+
+
+class StreamingResultParser(HTMLParser):
+    """增量解析，feed() 之后从 take() 取出已经完整的结果"""
+
+    def __init__(self, spec):
+        super().__init__(convert_charrefs=True)
+        self.spec = spec
+        self._stack = []
+        self._container = None      # 选中的容器选择器
+        self._item_depth = None     # 当前结果容器在栈中的位置
+        self._found = {}            # 字段 -> (优先级, 值)
+        self._captures = []
+        self._text = []
+        self._ready = []
+
+    def take(self):
+        ready, self._ready = self._ready, []
+        if ready and self.spec.batch_filter:
+            ready = self.spec.batch_filter(ready)
+        return ready
+
+    # 连续的文字可能被分在多次 feed 中，遇到标签时再作为一段文字处理
+    def handle_data(self, data):
+        if self._captures:
+            self._text.append(data)
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        self._text = []
+        if self._stack and self._stack[-1] in SKIP_TEXT_TAGS:
+            return
+        for capture in self._captures:
+            if capture.strip:
+                text_part = text.strip()
+                if text_part:
+                    capture.parts.append(text_part)
+            else:
+                capture.parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        attrs = dict(attrs)
+        if self._item_depth is None:
+            self._maybe_open_item(tag, attrs)
+        else:
+            self._match_fields(tag, attrs)
+        if tag not in VOID_TAGS:
+            self._stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        if self._item_depth is not None:
+            self._match_fields(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag not in self._stack:
+            return
+        while self._stack:
+            if self._stack.pop() == tag:
+                break
+        depth = len(self._stack)
+        if self._captures:
+            for capture in [c for c in self._captures if c.depth >= depth]:
+                self._captures.remove(capture)
+                self._set(capture.field, capture.rank, ''.join(capture.parts))
+        if self._item_depth is not None and self._item_depth >= depth:
+            self._close_item()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        # 页面在结果容器内被截断时，已经读到的部分仍然作为一条结果
+        if self._item_depth is not None:
+            for capture in self._captures:
+                self._set(capture.field, capture.rank, ''.join(capture.parts))
+            self._close_item()
+
+    def _maybe_open_item(self, tag, attrs):
+        containers = [self._container] if self._container else self.spec.containers
+        for selector in containers:
+            if selector.matches(tag, attrs):
+                self._container = selector
+                self._item_depth = len(self._stack)
+                self._found = {}
+                return
+
+    def _match_fields(self, tag, attrs):
+        for name, field in self.spec.fields.items():
+            current = self._found.get(name)
+            for rank, selector in enumerate(field.selectors):
+                if current is not None and current[0] <= rank:
+                    break
+                if any(c.field == name and c.rank <= rank for c in self._captures):
+                    break
+                if selector.matches(tag, attrs):
+                    if field.attr:
+                        self._set(name, rank, attrs.get(field.attr) or '')
+                    elif tag in VOID_TAGS:
+                        self._set(name, rank, '')
+                    else:
+                        self._captures.append(_Capture(name, rank, len(self._stack), field.strip))
+                    break
+
+    def _set(self, name, rank, value):
+        current = self._found.get(name)
+        if current is None or rank < current[0]:
+            self._found[name] = (rank, value)
+
+    def _close_item(self):
+        self._item_depth = None
+        self._captures = []
+        found = {name: value for name, (_, value) in self._found.items()}
+        if all(name in found for name in self.spec.required):
+            result = SearchResult(**found)
+            if self.spec.fixup:
+                result = self.spec.fixup(result)
+            if result is not None:
+                self._ready.append(result)
+
+
+def iter_results(chunks, spec, limit=10):
+    """chunks 为已解码的文本块，逐条产出结果，达到 limit 条后停止读取"""
+    parser = StreamingResultParser(spec)
+    emitted = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        for result in parser.take():
+            yield result
+            emitted += 1
+            if emitted >= limit:
+                return
+    parser.close()
+    for result in parser.take()[:limit - emitted]:
+        yield result
+
+
+def _response_encoding(response):
+    # 没有声明 charset 时 requests 会按 ISO-8859-1 处理，结果页实际都是 UTF-8
+    if 'charset=' in (response.headers.get('Content-Type') or '').lower() and response.encoding:
+        try:
+            return codecs.lookup(response.encoding).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def iter_text(response, max_bytes, max_seconds=None, chunk_size=16384):
+    """按块读取 requests 的流式响应（stream=True）并增量解码
+
+    累计超过 max_bytes 字节或读取超过 max_seconds 秒时停止读取，只解析已经收到的部分。
+    """
+    decoder = codecs.getincrementaldecoder(_response_encoding(response))(errors='replace')
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    received = 0
+    for chunk in response.iter_content(chunk_size):
+        received += len(chunk)
+        if received > max_bytes:
+            chunk = chunk[:len(chunk) - (received - max_bytes)]
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+        if received >= max_bytes:
+            log.warning("Response from %s reached %d bytes, truncated", response.url, max_bytes)
+            break
+        if deadline and time.monotonic() > deadline:
+            log.warning("Reading %s took more than %ss, truncated", response.url, max_seconds)
+            break
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def parse_html(html, spec, limit=10):
+    """解析完整的页面文本"""
+    return list(iter_results([html], spec, limit))
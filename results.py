@@ -0,0 +1,82 @@
+"""搜索结果记录
+
+SearchResult 用 __slots__ 保存一条结果，比五个键的字典省内存，属性访问也更快；
+ResultSet 按搜索引擎保存一个事件的全部结果，遍历时依次经过各引擎的列表，不做拼接复制。
+"""
+from itertools import chain
+
+ENGINES = ('bing', 'msn', 'baidu')
+
+
+class SearchResult:
+    __slots__ = ('title', 'link', 'snippet', 'image_url', 'time')
+
+    def __init__(self, title='', link='', snippet='', image_url='', time=''):
+        self.title = title
+        self.link = link
+        self.snippet = snippet
+        self.image_url = image_url
+        self.time = time
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(
+            data.get('title') or '',
+            data.get('link') or '',
+            data.get('snippet') or '',
+            data.get('image_url') or '',
+            data.get('time') or '',
+        )
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'link': self.link,
+            'snippet': self.snippet,
+            'image_url': self.image_url,
+            'time': self.time,
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, SearchResult):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f'SearchResult(title={self.title!r}, link={self.link!r})'
+
+
+class ResultSet:
+    """一个事件在各搜索引擎上的结果"""
+
+    __slots__ = ENGINES
+
+    def __init__(self, bing=(), msn=(), baidu=()):
+        self.bing = list(bing)
+        self.msn = list(msn)
+        self.baidu = list(baidu)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*([SearchResult.from_dict(item) for item in data.get(engine) or []] for engine in ENGINES))
+
+    def to_dict(self):
+        return {engine: [result.to_dict() for result in getattr(self, engine)] for engine in ENGINES}
+
+    def groups(self):
+        """(搜索引擎, 结果列表)，按 ENGINES 的顺序"""
+        return [(engine, getattr(self, engine)) for engine in ENGINES]
+
+    def counts(self):
+        return {engine: len(getattr(self, engine)) for engine in ENGINES}
+
+    def __iter__(self):
+        return chain(self.bing, self.msn, self.baidu)
+
+    def __len__(self):
+        return len(self.bing) + len(self.msn) + len(self.baidu)
+
+    def __bool__(self):
+        return bool(self.bing or self.msn or self.baidu)
@@ -0,0 +1,70 @@
+"""生产环境启动入口：多进程 + 多线程的 gunicorn 服务
+
+用法：python serve.py
+
+可通过环境变量调整：
+    WEB_BIND               监听地址，默认 0.0.0.0:5000
+    WEB_WORKERS            worker 进程数，默认 CPU 核数 * 2 + 1
+    WEB_THREADS            每个 worker 的线程数，默认 4
+    WEB_TIMEOUT            单个请求超时（秒），默认 120
+    WEB_GRACEFUL_TIMEOUT   收到 SIGTERM 后等待进行中请求和发布任务的时间（秒），默认 30
+
+多个 worker 时预览页面和发布任务的进度需要在进程间共享，没有设置 PREVIEW_STORE / JOB_STORE 时
+默认使用 instance/ 下的 SQLite 文件，请求落到任一 worker 上都能查到。
+"""
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+def worker_exit(server, worker):
+    """worker 退出前等待后台发布任务完成，留出余量避免被 master 强制结束"""
+    import app as web
+    web.drain(max(server.cfg.graceful_timeout - 2, 1))
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        # preload_app 时在 master 进程中执行一次，worker 通过 fork 共享
+        import app as web
+        web.warm_up()
+        return web.app
+
+
+def use_shared_stores(instance_path):
+    """未单独配置时，预览和任务都保存在同一台机器上各 worker 共用的 SQLite 文件中"""
+    os.makedirs(instance_path, exist_ok=True)
+    os.environ.setdefault('PREVIEW_STORE', 'sqlite:///' + os.path.join(instance_path, 'previews.db'))
+    os.environ.setdefault('JOB_STORE', 'sqlite:///' + os.path.join(instance_path, 'jobs.db'))
+
+
+def default_options():
+    workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+    if workers > 1:
+        # 必须在导入 app（load）之前设置
+        use_shared_stores(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance'))
+    return {
+        'bind': os.getenv('WEB_BIND', '0.0.0.0:5000'),
+        'workers': workers,
+        'threads': int(os.getenv('WEB_THREADS', '4')),
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': int(os.getenv('WEB_TIMEOUT', '120')),
+        'graceful_timeout': int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30')),
+        'worker_exit': worker_exit,
+        'accesslog': '-',
+    }
+
+
+if __name__ == '__main__':
+    ProductionServer(default_options()).run()
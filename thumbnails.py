@@ -0,0 +1,300 @@
+"""结果缩略图代理
+
+页面中的图片地址替换为 /thumbs/<key>，key 为原始地址的 SHA-1。第一次访问时才下载原图，缩放到
+.news-thumbnail 的尺寸后保存在磁盘上，之后直接返回缓存文件，响应带长期缓存头。
+data: URI 在渲染页面时就解码写入缓存，不再内嵌在页面里。
+
+只有渲染页面时登记过的地址（<key>.url）才会被下载，路由不能被用来请求任意地址。登记表和 data: URI
+图片（<key>.data，已缩放）保存在 registry 中（page_storage 的存储，配置了 PAGE_STORAGE_URL 时为各节点共用），
+任一节点都能返回其它节点渲染的页面中的图片；缩放后的图片缓存在各节点本地，总大小超过 max_bytes 时
+按最近访问时间淘汰。
+缩放使用 Pillow；无法导入时保存并返回原图。
+"""
+import base64
+import binascii
+import hashlib
+import html
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from urllib.parse import unquote_to_bytes
+
+import requests
+
+from page_storage import LocalPageStorage, create_page_storage
+
+log = logging.getLogger(__name__)
+
+# 只接受常见的位图格式，不缓存 SVG（可能包含脚本）
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+_KEY = re.compile(r'^[0-9a-f]{40}$')
+# 页面中代理后的缩略图地址，见 NEWS_ITEM_TEMPLATE
+_PROXIED = re.compile(r"url\('/thumbs/([0-9a-f]{40})'\)")
+
+
+def sniff(data):
+    for signature, mimetype in _SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def is_key(key):
+    return bool(_KEY.match(key))
+
+
+def decode_data_uri(uri):
+    """返回 data: URI 中的字节，格式不对时返回 None"""
+    header, sep, payload = uri.partition(',')
+    if not sep or not header.startswith('data:'):
+        return None
+    try:
+        if header.endswith(';base64'):
+            return base64.b64decode(payload, validate=False)
+        return unquote_to_bytes(payload)
+    except (binascii.Error, ValueError):
+        return None
+
+
+class ThumbnailCache:
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, size=(120, 80), max_source_bytes=10 * 1024 * 1024,
+                 timeout=10, registry=None):
+        self.directory = directory
+        # 默认与图片缓存共用目录，与之前的 <key>.url 文件位置相同
+        self.registry = registry if registry is not None else LocalPageStorage(directory)
+        # 本进程已确认登记过的 key -> 原图地址（data: URI 图片为 None），避免每次渲染都访问 registry
+        self._registered = OrderedDict()
+        self.max_bytes = max_bytes
+        self.size = size
+        self.max_source_bytes = max_source_bytes
+        self.timeout = timeout
+        self._total = None  # 图片文件总大小，第一次写入时扫描目录得到
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                                               '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key[:2], key + ext)
+
+    @staticmethod
+    def _name(key, ext):
+        return f'{key[:2]}/{key}{ext}'
+
+    def _is_registered(self, key, ext, url=None):
+        with self._lock:
+            if key in self._registered:
+                self._registered.move_to_end(key)
+                return True
+        if self.registry.stat(self._name(key, ext)) is None:
+            return False
+        self._remember(key, url)
+        return True
+
+    def _remember(self, key, url=None):
+        with self._lock:
+            self._registered[key] = url
+            self._registered.move_to_end(key)
+            while len(self._registered) > 10000:
+                self._registered.popitem(last=False)
+
+    def proxy_url(self, url):
+        """返回页面中使用的地址；无法代理的地址（空、相对路径等）原样返回"""
+        if not url:
+            return url
+        if url.startswith('data:'):
+            key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+            if self._is_registered(key, '.data') or self._store_data_uri(key, url):
+                return f'/thumbs/{key}'
+            return ''
+        if url.startswith('//'):
+            url = 'https:' + url
+        if not url.startswith(('http://', 'https://')):
+            return url
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        if not self._is_registered(key, '.url', url):
+            self.registry.put(self._name(key, '.url'), url.encode('utf-8'))
+            self._remember(key, url)
+        return f'/thumbs/{key}'
+
+    def original_url(self, key):
+        """proxy_url 的反向：登记的原图地址，data: URI 图片返回缩放后的 data: URI，未登记时返回 None"""
+        with self._lock:
+            url = self._registered.get(key)
+        if url is not None:
+            return url
+        url = self.registry.get(self._name(key, '.url'))
+        if url is not None:
+            return url.decode('utf-8')
+        data = self.registry.get(self._name(key, '.data'))
+        mimetype = data and sniff(data)
+        if not mimetype:
+            return None
+        return f"data:{mimetype};base64,{base64.b64encode(data).decode('ascii')}"
+
+    def unproxy_html(self, content):
+        """把页面中的 /thumbs/<key> 换回原图地址，用于没有 /thumbs 路由的静态托管；
+        找不到登记的图片留空，显示占位背景"""
+        resolved = {}
+
+        def replace(match):
+            key = match.group(1)
+            if key not in resolved:
+                try:
+                    resolved[key] = self.original_url(key)
+                except Exception as e:
+                    log.warning("Error resolving thumbnail %s: %s", key, e)
+                    resolved[key] = None
+            return f"url('{html.escape(resolved[key] or '', quote=True)}')"
+
+        return _PROXIED.sub(replace, content)
+
+    def _store_data_uri(self, key, uri):
+        data = decode_data_uri(uri)
+        if not data or len(data) > self.max_source_bytes or not sniff(data):
+            return False
+        if not self.put(key, data):
+            return False
+        # 缩放后的图片同时写入 registry，其它节点从这里取
+        with open(self._path(key, '.img'), 'rb') as f:
+            self.registry.put(self._name(key, '.data'), f.read())
+        self._remember(key)
+        return True
+
+    def get(self, key):
+        """返回 (文件路径, MIME 类型)，需要时下载原图；无法获取时返回 None"""
+        path = self._path(key, '.img')
+        try:
+            with open(path, 'rb') as f:
+                mimetype = sniff(f.read(12))
+            os.utime(path)  # 记录访问时间，供淘汰使用
+            return path, mimetype
+        except FileNotFoundError:
+            pass
+        url = self.registry.get(self._name(key, '.url'))
+        if url is not None:
+            data = self._download(url.decode('utf-8'))
+            if data is None or not self.put(key, data):
+                return None
+        else:
+            # 其它节点渲染时保存的 data: URI 图片，已经缩放过
+            data = self.registry.get(self._name(key, '.data'))
+            if data is None or not sniff(data):
+                return None
+            self._write(path, data)
+            self._account(len(data))
+        with open(path, 'rb') as f:
+            return path, sniff(f.read(12))
+
+    def _download(self, url):
+        try:
+            with self._session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                chunks, received = [], 0
+                for chunk in response.iter_content(65536):
+                    received += len(chunk)
+                    if received > self.max_source_bytes:
+                        log.warning("Thumbnail source %s exceeds %d bytes", url, self.max_source_bytes)
+                        return None
+                    chunks.append(chunk)
+            return b''.join(chunks)
+        except requests.RequestException as e:
+            log.warning("Error downloading thumbnail %s: %s", url, e)
+            return None
+
+    def put(self, key, data):
+        if not sniff(data):
+            return False
+        data = self.resize(data)
+        self._write(self._path(key, '.img'), data)
+        self._account(len(data))
+        return True
+
+    def resize(self, data):
+        """缩放并裁剪成 size 大小的 JPEG；没有 Pillow 或无法解码时返回原图"""
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            return data
+        try:
+            with Image.open(BytesIO(data)) as image:
+                # JPEG 解码时直接按接近目标的比例缩小，省去大部分解码工作
+                image.draft('RGB', (self.size[0] * 2, self.size[1] * 2))
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ('RGB', 'L'):
+                    background = Image.new('RGB', image.size, 'white')
+                    background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+                    image = background
+                image = ImageOps.fit(image, self.size, Image.LANCZOS)
+                output = BytesIO()
+                image.save(output, 'JPEG', quality=80, optimize=True)
+                return output.getvalue()
+        except Exception as e:
+            log.warning("Error resizing thumbnail: %s", e)
+            return data
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _scan(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.img'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _account(self, added):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            else:
+                self._total += added
+            if self._total <= self.max_bytes:
+                return
+            # 淘汰到上限的 90%，避免每次写入都扫描目录
+            files = sorted(self._scan())
+            total = sum(size for _, size, _ in files)
+            target = self.max_bytes * 0.9
+            removed = 0
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._total = total
+        log.info("Evicted %d thumbnails, cache now %d bytes", removed, total)
+
+
+def create_thumbnail_cache(default_directory):
+    width, _, height = os.getenv('THUMBNAIL_SIZE', '120x80').partition('x')
+    directory = os.getenv('THUMBNAIL_DIR') or default_directory
+    return ThumbnailCache(
+        directory=directory,
+        max_bytes=int(float(os.getenv('THUMBNAIL_CACHE_MB', '200')) * 1024 * 1024),
+        size=(int(width), int(height)),
+        registry=create_page_storage('thumbnails', directory),
+    )